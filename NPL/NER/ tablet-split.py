@@ -1,29 +1,9 @@
 import pandas as pd
 import re
+from ner_brands import KNOWN_BRANDS, build_brand_index
 
-# Array com os nomes das marcas
-brands: list = [
-    "ACER", "ASUS", "SAMSUNG", "Dell", "Positivo", "Lenovo", "VAIO",
-    "HP", "Apple", "Multilaser", "Anvazise", "ASHATA", "Santino", "MSI",
-    "Marca Fácil", "Microsoft", "AWOW", "Gateway", "Compaq", "DAUERHAFT",
-    "SGIN", "Luqeeg", "Kiboule", "LG", "Panasonic", "Focket", "Toughbook",
-    "LTI", "GIGABYTE", "Octoo", "Chip7 Informática", "GLOGLOW", "GOLDENTEC",
-    "KUU", "HEEPDD", "Adamantiun", "Naroote", "Jectse", "Heayzoki", "Galaxy",
-    "Motorola", "Xiaomi", "Nokia", "Poco", "realme", "Infinix", "Blu",
-    "Gshield", "Geonav", "Redmi", "Gorila Shield", "intelbras", "TCL",
-    "Tecno", "Vbestlife", "MaiJin", "SZAMBIT", "Otterbox", "Sony",
-    "HAIZ", "HUAWEI", "HAYLOU", "Amazfit", "Ticwatch", "Legado Engenharia",
-    "Microwear", "Lefal Cold", "MPOWER", "Kaymcixs", "Garmin", "123Smart",
-    "Technos", "IWO", "Polar", "Mormaii", "xsmart",
-    "EIGIIS", "Beyamis", "Hrich", "ANCOOL", "Dpofirs", "C7 company",
-    "ShieldForce", "FIT IT", "Blackview", "KALINCO", "Danet", "LDFAS",
-    "VINGVO", "MIJOBS", "KADES", "Naroote", "Gusfeliz",
-    "Fossil", "Withings", "Suunto", "Mobvoi", "Amazfit", "Garmin", "Fitbit",
-    "Huawei", "Apple", "Samsung", "TicWatch", "Polar", "Tag Heuer", "Casio",
-    "Amazfit", "Garmin", "Suunto", "Huawei", "Fitbit", "Amazfit", "Withings",
-    "Fossil", "Huawei", "Michael Kors", "Misfit", "TomTom", "Jawbone", "Zepp","Philco",
-    "Britânia", "Roku", "Dolby", "Philips", "Semp"
-]
+# Índice de marcas compilado uma única vez (com limites de palavra)
+brand_index = build_brand_index(KNOWN_BRANDS, word_boundary=True)
 
 def extract_model_based_on_brand(title):
     if not isinstance(title, str):
@@ -35,13 +15,12 @@ def extract_model_based_on_brand(title):
         return ipad_generation
     
     # Caso contrário, procurar o modelo baseado na marca
-    for brand in brands:
-        match = re.search(fr'\b{brand}\b', title, re.IGNORECASE)
-        if match:
-            # Pega apenas as palavras após a marca, sem incluir a própria marca
-            after_brand = title[match.end():].strip()
-            model = ' '.join(after_brand.split()[:3])  # Pega as 2-3 primeiras palavras após a marca
-            return model  # Retorna apenas o modelo, sem a marca
+    match = brand_index.search(title)
+    if match:
+        # Pega apenas as palavras após a marca, sem incluir a própria marca
+        after_brand = title[match.end():].strip()
+        model = ' '.join(after_brand.split()[:3])  # Pega as 2-3 primeiras palavras após a marca
+        return model  # Retorna apenas o modelo, sem a marca
     return None
 
 # Função para extrair a geração do iPad
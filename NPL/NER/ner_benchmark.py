@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+import pandas as pd
+import spacy
+from ner_brands import KNOWN_BRANDS
+from ner_engine import CATEGORY_CONFIGS, resolve_path
+from ner_metrics import percentile
+from ner_parallel import load_script
+from ner_router import CATEGORY_MODELS, MODELS_DIR
+from ner_training import add_labels, make_examples, update_epoch
+
+# Benchmark reprodutível das três etapas (rotulagem, treino e inferência) para as cinco categorias.
+# Os títulos são sintéticos: os valores de cada rótulo saem do vocabulário do modelo treinado.
+
+# Rótulo -> (regex sobre as strings do vocabulário, formato no título, formato na coluna do CSV, valores se o vocabulário não tiver nenhum)
+LABEL_SLOTS = {
+    # Códigos com letras e dígitos, exceto medidas como "32Gb" ou "5000mAh"
+    "MODEL": (r"(?!(?i:\d+(?:gb|tb|mah|hz|mp|p|w)$))(?=.*\d)(?=.*[A-Za-z])[A-Za-z0-9-]{4,}", "{}", "{}",
+              ["A15", "G84", "X200"]),
+    "RAM": (r"2|3|4|6|8|12|16", "{}GB RAM", "{}GB RAM", ["4", "8"]),
+    "STORAGE": (r"32|64|128|256|512", "{}GB", "{}GB", ["64", "128"]),
+    "SSD": (r"128|256|512", "{}GB SSD", "{}GB SSD", ["256", "512"]),
+    "CPU": (r"\d{4,5}[A-Za-z]{1,2}", "Intel Core i5-{}", "Intel Core i5-{}", ["1235U"]),
+    "GPU": (r"[1-4]0[5-9]0", "RTX {}", "RTX {}", ["3050"]),
+    "SIZE": (r"24|32|40|43|50|55|58|65|70|75|85", '{}"', "{}", ["50", "55"]),
+    "RESOLUTION": (r"4[Kk]|UHD|Full|HD|8[Kk]", "{}", "{}", ["4K", "HD"]),
+    "TECHNOLOGY": (r"LED|QLED|OLED|NanoCell|QNED|Crystal", "{}", "{}", ["LED"]),
+}
+
+# Categoria -> (prefixo do título, coluna do título, {rótulo: coluna}) no formato do rotulador de ner_engine
+SYNTHETIC_LAYOUTS = {
+    "celulares": ("Smartphone", "title", {"MODEL": "modelo", "STORAGE": None, "RAM": None}),
+    "notebooks": ("Notebook", "titulo", {"MODEL": "modelo", "CPU": "CPU", "GPU": "GPU", "RAM": "RAM", "SSD": "SSD"}),
+    "smartwatches": ("Smartwatch", "title", {"BRAND": "brand", "MODEL": "modelo"}),
+    "tablets": ("Tablet", "Título", {"MODEL": "Modelo", "RAM": "RAM", "STORAGE": "Armazenamento"}),
+    "tvs": ("Smart TV", "titulo", {"SIZE": "polegadas", "RESOLUTION": "resolucao", "TECHNOLOGY": "tecnologia",
+                                   "MODEL": "modelo"}),
+}
+
+FILLER = re.compile(r"[a-zà-ú]{4,}")
+
+def vocab_strings(category):
+    with open(os.path.join(MODELS_DIR, CATEGORY_MODELS[category], "vocab", "strings.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+def slot_values(strings):
+    """Valores candidatos de cada rótulo e palavras de enchimento tirados do vocabulário."""
+    values = {}
+    for label, (pattern, _, _, fallback) in LABEL_SLOTS.items():
+        compiled = re.compile(pattern)
+        values[label] = sorted({s for s in strings if compiled.fullmatch(s)}) or fallback
+    known = {brand.casefold() for brand in KNOWN_BRANDS}
+    values["BRAND"] = sorted({s for s in strings if s.casefold() in known}) or ["Samsung"]
+    values["FILLER"] = sorted({s for s in strings if FILLER.fullmatch(s)}) or ["preto"]
+    return values
+
+def synthetic_frame(category, rows, seed=0):
+    """DataFrame de títulos sintéticos com as colunas que o rotulador da categoria espera."""
+    rng = random.Random(seed)
+    prefix, title_column, label_columns = SYNTHETIC_LAYOUTS[category]
+    values = slot_values(vocab_strings(category))
+    records = []
+    for _ in range(rows):
+        parts, record = [], {}
+        for label, column in label_columns.items():
+            token = rng.choice(values[label])
+            if label == "BRAND":
+                text = cell = token
+            else:
+                _, title_format, column_format, _ = LABEL_SLOTS[label]
+                text, cell = title_format.format(token), column_format.format(token)
+            parts.append(text)
+            if column:
+                record[column] = cell
+        rng.shuffle(parts)
+        parts += rng.sample(values["FILLER"], min(rng.randint(0, 3), len(values["FILLER"])))
+        record[title_column] = " ".join([prefix] + parts)
+        records.append(record)
+    return pd.DataFrame(records)
+
+def bench_labeling(module, frame, repeat=3):
+    """Linhas/s de prepare_training_data (melhor de `repeat` execuções)."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        training_data = module.prepare_training_data(frame.copy())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {"rows": len(frame), "labeled": len(training_data), "seconds": round(best, 4),
+            "rows_per_sec": round(len(frame) / best, 1)}, training_data
+
+def bench_training(training_data, epochs):
+    """Segundos por época de um NER novo (pt em branco) sobre os exemplos rotulados."""
+    nlp = spacy.blank("pt")
+    ner = nlp.add_pipe("ner")
+    examples = make_examples(nlp, training_data)
+    add_labels(ner, examples)
+    optimizer = nlp.begin_training()
+    times = []
+    for _ in range(epochs):
+        random.shuffle(examples)
+        start = time.perf_counter()
+        update_epoch(nlp, examples, optimizer)
+        times.append(time.perf_counter() - start)
+    return {"examples": len(examples), "epochs": epochs, "seconds_per_epoch": round(sum(times) / len(times), 4)}
+
+def bench_inference(nlp, titles, batch_sizes, process_counts, latency_batches=50):
+    """docs/s de nlp.pipe para cada combinação de batch_size e n_process.
+
+    A latência (p50/p99 de um lote) é medida só com n_process=1, chamando nlp.pipe
+    lote a lote como faria um serviço; com mais processos fica só a vazão.
+    """
+    results = []
+    for n_process in process_counts:
+        for batch_size in batch_sizes:
+            start = time.perf_counter()
+            for _ in nlp.pipe(titles, batch_size=batch_size, n_process=n_process):
+                pass
+            elapsed = time.perf_counter() - start
+            result = {"batch_size": batch_size, "n_process": n_process, "docs": len(titles),
+                      "docs_per_sec": round(len(titles) / elapsed, 1), "p50_ms": None, "p99_ms": None}
+            if n_process == 1:
+                latencies = []
+                for i in range(0, min(len(titles), batch_size * latency_batches), batch_size):
+                    batch_start = time.perf_counter()
+                    list(nlp.pipe(titles[i:i + batch_size], batch_size=batch_size))
+                    latencies.append((time.perf_counter() - batch_start) * 1000)
+                result["p50_ms"] = round(percentile(latencies, 50), 3)
+                result["p99_ms"] = round(percentile(latencies, 99), 3)
+            results.append(result)
+            latency = f"p50={result['p50_ms']}ms p99={result['p99_ms']}ms" if n_process == 1 else ""
+            print(f"    batch_size={batch_size:5d} n_process={n_process}  {result['docs_per_sec']:10.1f} docs/s  {latency}")
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def run(categories, stages, rows, train_rows, epochs, batch_sizes, process_counts, seed):
+    report = {
+        "meta": {"commit": git_commit(), "python": platform.python_version(), "spacy": spacy.__version__,
+                 "cpu_count": os.cpu_count(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "seed": seed,
+                 "rows": rows, "train_rows": train_rows},
+        "categories": {},
+    }
+    for category in categories:
+        print(f"== {category}")
+        random.seed(seed)
+        frame = synthetic_frame(category, rows, seed)
+        result = {}
+        module = load_script(resolve_path(CATEGORY_CONFIGS[category]["script"]))
+        labeling, training_data = bench_labeling(module, frame)
+        if "labeling" in stages:
+            result["labeling"] = labeling
+            print(f"    labeling  {labeling['rows_per_sec']:10.1f} rows/s")
+        if "training" in stages:
+            result["training"] = bench_training(training_data[:train_rows], epochs)
+            print(f"    training  {result['training']['seconds_per_epoch']:.2f} s/epoch")
+        if "inference" in stages:
+            nlp = spacy.load(os.path.join(MODELS_DIR, CATEGORY_MODELS[category]))
+            titles = frame[SYNTHETIC_LAYOUTS[category][1]].tolist()
+            result["inference"] = bench_inference(nlp, titles, batch_sizes, process_counts)
+        report["categories"][category] = result
+    return report
+
+# Métricas em que maior é melhor; nas demais (tempos), menor é melhor
+HIGHER_IS_BETTER = {"rows_per_sec", "docs_per_sec"}
+METRICS = ("rows_per_sec", "seconds_per_epoch", "docs_per_sec", "p50_ms", "p99_ms")
+
+def flatten(report):
+    """{(categoria, etapa, batch_size, n_process, métrica): valor} para comparar relatórios."""
+    flat = {}
+    for category, stages in report["categories"].items():
+        for stage, result in stages.items():
+            for entry in result if isinstance(result, list) else [result]:
+                key = (category, stage, entry.get("batch_size"), entry.get("n_process"))
+                for metric in METRICS:
+                    if entry.get(metric) is not None:
+                        flat[key + (metric,)] = entry[metric]
+    return flat
+
+def compare(old_report, new_report, tolerance=0.1):
+    """Imprime as diferenças entre dois relatórios e retorna as métricas que pioraram mais que `tolerance`."""
+    old, new = flatten(old_report), flatten(new_report)
+    regressions = []
+    for key in sorted(set(old) & set(new), key=str):
+        before, after = old[key], new[key]
+        if not before:
+            continue
+        change = (after - before) / before
+        worse = -change if key[-1] in HIGHER_IS_BETTER else change
+        flag = "REGRESSION" if worse > tolerance else ""
+        if flag:
+            regressions.append(key)
+        print(f"{'/'.join(str(part) for part in key if part is not None):<55} {before:>12} -> {after:<12} "
+              f"{change:+7.1%} {flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de rotulagem, treino e inferência dos modelos NER")
+    parser.add_argument("output", help="arquivo JSON com os resultados")
+    parser.add_argument("--categories", nargs="+", default=list(SYNTHETIC_LAYOUTS))
+    parser.add_argument("--stages", nargs="+", default=["labeling", "training", "inference"],
+                        choices=["labeling", "training", "inference"])
+    parser.add_argument("--rows", type=int, default=20000, help="títulos sintéticos por categoria")
+    parser.add_argument("--train-rows", type=int, default=2000, help="exemplos usados no treino")
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 256, 1000])
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", help="relatório JSON anterior para comparar")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="piora relativa considerada regressão")
+    args = parser.parse_args()
+
+    report = run(args.categories, args.stages, args.rows, args.train_rows, args.epochs,
+                 args.batch_sizes, args.processes, args.seed)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Saved {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions above {args.tolerance:.0%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
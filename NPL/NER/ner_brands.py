@@ -0,0 +1,47 @@
+import re
+from ner_patterns import find_entity
+
+# Marcas conhecidas usadas na rotulagem fraca (a lista tem repetições; o índice abaixo remove)
+KNOWN_BRANDS = [
+    "ACER", "ASUS", "SAMSUNG", "Dell", "Positivo", "Lenovo", "VAIO",
+    "HP", "Apple", "Multilaser", "Anvazise", "ASHATA", "Santino", "MSI",
+    "Marca Fácil", "Microsoft", "AWOW", "Gateway", "Compaq", "DAUERHAFT",
+    "SGIN", "Luqeeg", "Kiboule", "LG", "Panasonic", "Focket", "Toughbook",
+    "LTI", "GIGABYTE", "Octoo", "Chip7 Informática", "GLOGLOW", "GOLDENTEC",
+    "KUU", "HEEPDD", "Adamantiun", "Naroote", "Jectse", "Heayzoki", "Galaxy",
+    "Motorola", "Xiaomi", "Nokia", "Poco", "realme", "Infinix", "Blu",
+    "Gshield", "Geonav", "Redmi", "Gorila Shield", "intelbras", "TCL",
+    "Tecno", "Vbestlife", "MaiJin", "SZAMBIT", "Otterbox", "Sony",
+    "HAIZ", "HUAWEI", "HAYLOU", "Amazfit", "Ticwatch", "Legado Engenharia",
+    "Microwear", "Lefal Cold", "MPOWER", "Kaymcixs", "Garmin", "123Smart",
+    "Technos", "IWO", "Polar", "Mormaii", "xsmart",
+    "EIGIIS", "Beyamis", "Hrich", "ANCOOL", "Dpofirs", "C7 company",
+    "ShieldForce", "FIT IT", "Blackview", "KALINCO", "Danet", "LDFAS",
+    "VINGVO", "MIJOBS", "KADES", "Naroote", "Gusfeliz",
+    "Fossil", "Withings", "Suunto", "Mobvoi", "Amazfit", "Garmin", "Fitbit",
+    "Huawei", "Apple", "Samsung", "TicWatch", "Polar", "Tag Heuer", "Casio",
+    "Amazfit", "Garmin", "Suunto", "Huawei", "Fitbit", "Amazfit", "Withings",
+    "Fossil", "Huawei", "Michael Kors", "Misfit", "TomTom", "Jawbone", "Zepp","Philco",
+    "Britânia", "Roku", "Dolby", "Philips", "Semp"
+]
+
+def build_brand_index(brands, word_boundary=False):
+    """Compila as marcas (sem repetições, ignorando caixa) em uma única regex de alternância.
+
+    As marcas mais longas vêm primeiro para que, na mesma posição, "Samsung Galaxy"
+    ganhe de "Samsung".
+    """
+    unique_brands = {}
+    for brand in brands:
+        unique_brands.setdefault(brand.casefold(), brand)
+    alternatives = sorted(unique_brands.values(), key=len, reverse=True)
+    pattern = '|'.join(re.escape(brand) for brand in alternatives)
+    if word_boundary:
+        pattern = rf'\b(?:{pattern})\b'
+    return re.compile(pattern, re.IGNORECASE)
+
+BRAND_INDEX = build_brand_index(KNOWN_BRANDS)
+
+def find_brand(text, existing_entities=(), index=BRAND_INDEX):
+    """Encontra, em uma única passada, a marca mais à esquerda que não sobrepõe outras entidades."""
+    return find_entity('BRAND', index, text, existing_entities)
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import sqlite3
+import unicodedata
+from collections import OrderedDict
+
+def model_fingerprint(model_dir):
+    """Calcula um hash do conteúdo do diretório do modelo (nomes e bytes de todos os arquivos)."""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(model_dir):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, model_dir).encode('utf-8'))
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+    return digest.hexdigest()[:16]
+
+def normalize_title(title):
+    """Normaliza o título usado como chave do cache (unicode NFC e espaços colapsados)."""
+    if not isinstance(title, str):
+        return ''
+    return ' '.join(unicodedata.normalize('NFC', title).split())
+
+class TitleCache:
+    """Cache título -> entidades com um LRU em memória na frente de um SQLite local.
+
+    As entradas são gravadas junto com o fingerprint do modelo; ao abrir o cache com
+    um fingerprint diferente, as entradas antigas são descartadas.
+    """
+
+    def __init__(self, db_path, fingerprint, max_size=100000, commit_every=1000):
+        self.fingerprint = fingerprint
+        self.max_size = max_size
+        self.commit_every = commit_every
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._pending_writes = 0
+
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entities ("
+            "fingerprint TEXT NOT NULL, title TEXT NOT NULL, result TEXT NOT NULL, "
+            "PRIMARY KEY (fingerprint, title))"
+        )
+        # Invalida tudo que foi calculado por outro modelo
+        self.conn.execute("DELETE FROM entities WHERE fingerprint != ?", (fingerprint,))
+        self.conn.commit()
+
+    def _remember(self, key, entities):
+        self.memory[key] = entities
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.max_size:
+            self.memory.popitem(last=False)
+
+    def get(self, title):
+        """Retorna as entidades em cache para o título (já normalizado) ou None."""
+        entities = self.memory.get(title)
+        if entities is not None:
+            self.memory.move_to_end(title)
+            self.hits += 1
+            return dict(entities)
+
+        row = self.conn.execute(
+            "SELECT result FROM entities WHERE fingerprint = ? AND title = ?",
+            (self.fingerprint, title),
+        ).fetchone()
+        if row is not None:
+            entities = json.loads(row[0])
+            self._remember(title, entities)
+            self.hits += 1
+            self.disk_hits += 1
+            return dict(entities)
+
+        self.misses += 1
+        return None
+
+    def put(self, title, entities):
+        """Grava as entidades do título (já normalizado) nas duas camadas."""
+        self._remember(title, dict(entities))
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entities (fingerprint, title, result) VALUES (?, ?, ?)",
+            (self.fingerprint, title, json.dumps(entities, ensure_ascii=False)),
+        )
+        self._pending_writes += 1
+        if self._pending_writes >= self.commit_every:
+            self.flush()
+
+    def flush(self):
+        """Confirma as gravações pendentes no SQLite."""
+        self.conn.commit()
+        self._pending_writes = 0
+
+    def stats(self):
+        """Retorna os contadores de acerto/erro do cache."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'memory_hits': self.hits - self.disk_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'memory_size': len(self.memory),
+        }
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
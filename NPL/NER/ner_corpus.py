@@ -0,0 +1,93 @@
+import hashlib
+import inspect
+import os
+from spacy.tokens import Doc, DocBin
+from spacy.training import Example
+from ner_io import iter_table, read_table
+from ner_metrics import METRICS
+from ner_parallel import parallel_training_data
+from ner_training import make_examples
+
+# Corpus rotulado em cache, endereçado pelo conteúdo do CSV, pelo código do rotulador e pela categoria
+CACHE_DIR = "corpus_cache"
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Módulos compartilhados que também definem os rótulos gerados
+LABELER_MODULES = ("ner_labeling.py", "ner_patterns.py", "ner_brands.py")
+
+def labeler_version(*functions, extra=""):
+    """Hash do código do rotulador: as funções da categoria e os módulos compartilhados de rotulagem."""
+    digest = hashlib.sha256(extra.encode("utf-8"))
+    for function in functions:
+        digest.update(inspect.getsource(function).encode("utf-8"))
+    for name in LABELER_MODULES:
+        with open(os.path.join(MODULE_DIR, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def corpus_key(csv_path, category, version):
+    """Chave do corpus: hash dos bytes do CSV, da versão do rotulador e da categoria."""
+    digest = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    digest.update(version.encode("utf-8"))
+    digest.update(category.encode("utf-8"))
+    return digest.hexdigest()[:24]
+
+def save_examples(examples, path):
+    """Grava os Docs de referência (já anotados) em um arquivo .spacy."""
+    docbin = DocBin(docs=(example.reference for example in examples), store_user_data=False)
+    tmp_path = path + ".tmp"
+    docbin.to_disk(tmp_path)
+    # Troca atômica para que um processo interrompido não deixe um corpus pela metade
+    os.replace(tmp_path, path)
+
+def load_examples(nlp, path):
+    """Lê os Docs anotados do .spacy e monta os Examples sem passar pelo tokenizer."""
+    examples = []
+    for reference in DocBin().from_disk(path).get_docs(nlp.vocab):
+        predicted = Doc(nlp.vocab, words=[t.text for t in reference], spaces=[bool(t.whitespace_) for t in reference])
+        examples.append(Example(predicted, reference))
+    return examples
+
+def cached_examples(nlp, csv_path, category, prepare_training_data, labeler_functions=(),
+                    load_data=read_table, cache_dir=CACHE_DIR, workers=1, chunksize=50000, key_extra="",
+                    load_chunks=None):
+    """Examples de treino do CSV, lidos do cache quando CSV, rotulador e categoria não mudaram.
+
+    Com workers > 1, a rotulagem roda em pedaços de `chunksize` linhas num pool de processos;
+    os pedaços vêm de load_chunks(csv_path, chunksize), que deve ler o mesmo que load_data.
+    `key_extra` entra na chave do cache (ex.: um mapeamento de colunas aplicado em load_data).
+    """
+    version = labeler_version(prepare_training_data, *labeler_functions, extra=key_extra)
+    path = os.path.join(cache_dir, f"{category}-{corpus_key(csv_path, category, version)}.spacy")
+    if os.path.exists(path):
+        print(f"Loading cached corpus {path}")
+        METRICS.count("corpus_cache", result="hit")
+        with METRICS.timer("corpus_load", rss=True):
+            return load_examples(nlp, path)
+
+    METRICS.count("corpus_cache", result="miss")
+    if workers > 1:
+        if load_chunks is not None:
+            chunks = load_chunks(csv_path, chunksize)
+        elif load_data is read_table:
+            chunks = iter_table(csv_path, chunksize)
+        else:
+            # load_data próprio sem load_chunks: lido inteiro e fatiado, para o resultado ser o mesmo de workers=1
+            df = load_data(csv_path)
+            chunks = (df.iloc[start:start + chunksize] for start in range(0, len(df), chunksize))
+        # Leitura e rotulagem acontecem juntas: os pedaços são lidos enquanto os anteriores são rotulados
+        with METRICS.timer("labeling", rss=True):
+            training_data = parallel_training_data(chunks, prepare_training_data, workers)
+    else:
+        with METRICS.timer("csv_load", rss=True):
+            df = load_data(csv_path)
+        with METRICS.timer("labeling", rss=True):
+            training_data = prepare_training_data(df)
+    METRICS.count("labeled_rows", len(training_data))
+    examples = make_examples(nlp, training_data, category)
+    os.makedirs(cache_dir, exist_ok=True)
+    save_examples(examples, path)
+    print(f"Saved corpus {path} ({len(examples)} examples)")
+    return examples
@@ -0,0 +1,129 @@
+import re
+import zlib
+from collections import defaultdict
+import numpy as np
+from ner_cache import normalize_title
+from ner_metrics import METRICS
+
+# Deduplicação do corpus antes do treino: anúncios idênticos são colapsados e títulos quase
+# iguais (MinHash/LSH sobre shingles de caracteres) viram um único representante com peso
+# igual ao tamanho do grupo. train_epochs sorteia cada época proporcionalmente a esses pesos.
+# Só se juntam títulos com as mesmas entidades (rótulo e texto): "8GB" e "6GB" de RAM
+# continuam sendo exemplos distintos.
+
+DEDUP_THRESHOLD = 0.9
+MERSENNE_PRIME = (1 << 61) - 1
+
+def shingles(text, k=5):
+    """Conjunto de substrings de k caracteres do título normalizado (minúsculo)."""
+    text = normalize_title(text).lower()
+    if len(text) <= k:
+        return {text}
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+def minhash_signatures(texts, num_perm=64, k=5, seed=0):
+    """Matriz (títulos x num_perm) de assinaturas MinHash."""
+    rng = np.random.RandomState(seed)
+    # a, b < 2**32 e hashes de 32 bits: a * h + b cabe em uint64 sem estourar
+    a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+    b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint64)
+    for i, text in enumerate(texts):
+        hashes = np.array([zlib.crc32(s.encode("utf-8")) for s in shingles(text, k)], dtype=np.uint64)
+        signatures[i] = ((np.outer(hashes, a) + b) % MERSENNE_PRIME).min(axis=0)
+    return signatures
+
+def lsh_rows(num_perm, threshold):
+    """Linhas por banda: o maior divisor r de num_perm cujo limiar do LSH, (r/num_perm)^(1/r), não passa de threshold.
+
+    O LSH gera candidatos com folga; cada par candidato ainda é conferido pela similaridade estimada.
+    """
+    best = 1
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows == 0 and (rows / num_perm) ** (1 / rows) <= threshold:
+            best = rows
+    return best
+
+def example_key(example):
+    """Tokens (minúsculos) e entidades da referência: iguais = anúncio duplicado com o mesmo rótulo."""
+    reference = example.reference
+    return (tuple(token.lower_ for token in reference),
+            tuple((ent.start, ent.end, ent.label_) for ent in reference.ents))
+
+def entity_values(example):
+    """(rótulo, texto normalizado) das entidades da referência, ordenados."""
+    return tuple(sorted((ent.label_, re.sub(r'\s+', '', ent.text).casefold()) for ent in example.reference.ents))
+
+def near_duplicate_clusters(texts, entity_sets, threshold=DEDUP_THRESHOLD, num_perm=64):
+    """Índice do representante (o primeiro do grupo) de cada título.
+
+    Só títulos com as mesmas entidades (entity_values) podem cair no mesmo grupo, para que
+    nem a distribuição dos rótulos nem os valores anotados mudem. Cada título só entra num
+    grupo se for parecido com o representante do grupo, então grupos não se encadeiam.
+    """
+    parent = list(range(len(texts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    signatures = minhash_signatures(texts, num_perm)
+    rows = lsh_rows(num_perm, threshold)
+    for band in range(0, num_perm, rows):
+        buckets = defaultdict(list)
+        for i in range(len(texts)):
+            buckets[(entity_sets[i], signatures[i, band:band + rows].tobytes())].append(i)
+        for members in buckets.values():
+            anchor = members[0]
+            for i in members[1:]:
+                root_a, root_i = find(anchor), find(i)
+                # O título e o representante do seu grupo precisam ser parecidos com o representante do outro
+                if (root_a != root_i and similarity(signatures, i, root_a) >= threshold
+                        and similarity(signatures, root_i, root_a) >= threshold):
+                    parent[max(root_a, root_i)] = min(root_a, root_i)
+    return [find(i) for i in range(len(texts))]
+
+def similarity(signatures, i, j):
+    """Jaccard estimado entre os títulos i e j (fração de posições iguais nas assinaturas)."""
+    return (signatures[i] == signatures[j]).mean()
+
+def collapse_duplicates(examples, threshold=DEDUP_THRESHOLD, num_perm=64, category=None):
+    """Um Example por grupo de duplicatas, com o tamanho do grupo em reference.user_data["weight"].
+
+    threshold None desliga a etapa de quase-duplicatas (só as exatas são colapsadas).
+    """
+    groups = {}
+    for example in examples:
+        key = example_key(example)
+        if key in groups:
+            groups[key][1] += 1
+        else:
+            groups[key] = [example, 1]
+    unique = [example for example, _ in groups.values()]
+    counts = [count for _, count in groups.values()]
+
+    if threshold is not None and len(unique) > 1:
+        with METRICS.timer("dedup"):
+            entity_sets = [entity_values(eg) for eg in unique]
+            roots = near_duplicate_clusters([eg.reference.text for eg in unique], entity_sets, threshold, num_perm)
+    else:
+        roots = list(range(len(unique)))
+
+    weights = defaultdict(int)
+    for root, count in zip(roots, counts):
+        weights[root] += count
+    kept = []
+    for i in sorted(weights):
+        unique[i].reference.user_data["weight"] = weights[i]
+        kept.append(unique[i])
+
+    exact, near = len(examples) - len(unique), len(unique) - len(kept)
+    labels = {"category": category} if category else {}
+    METRICS.count("dedup_examples", len(kept), result="kept", **labels)
+    METRICS.count("dedup_examples", exact, result="exact", **labels)
+    METRICS.count("dedup_examples", near, result="near", **labels)
+    print(f"Dedup{' ' + category if category else ''}: {len(examples)} examples -> {len(kept)} "
+          f"({exact} exact duplicates, {near} near duplicates)")
+    return kept
@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import random
+import spacy
+from spacy.tokens import Doc
+from spacy.training import Example
+from ner_benchmark import bench_inference, synthetic_frame, SYNTHETIC_LAYOUTS
+from ner_cache import model_fingerprint
+from ner_corpus import CACHE_DIR, corpus_key, load_examples, save_examples
+from ner_io import iter_table
+from ner_router import CATEGORY_MODELS, MODELS_DIR
+from ner_training import add_labels, evaluate, split_examples, train_epochs
+
+# Destilação: o modelo treinado (professor) rotula títulos sem anotação e um modelo
+# mais estreito e raso (aluno) aprende a reproduzir essas entidades.
+
+# Todos os modelos em trained_models/ usam width 96, depth 4, embed_size 2000 e hidden_width 64
+STUDENT_PRESETS = {
+    "small": {"width": 64, "depth": 2, "embed_size": 1000, "hidden_width": 32},
+    "tiny": {"width": 32, "depth": 1, "embed_size": 500, "hidden_width": 16},
+}
+
+def student_model_config(width, depth, embed_size, hidden_width):
+    """Config do componente ner com a mesma arquitetura do professor, só que menor."""
+    return {
+        "model": {
+            "@architectures": "spacy.TransitionBasedParser.v2",
+            "state_type": "ner",
+            "extra_state_tokens": False,
+            "hidden_width": hidden_width,
+            "maxout_pieces": 2,
+            "use_upper": True,
+            "nO": None,
+            "tok2vec": {
+                "@architectures": "spacy.HashEmbedCNN.v2",
+                "pretrained_vectors": None,
+                "width": width,
+                "depth": depth,
+                "embed_size": embed_size,
+                "window_size": 1,
+                "maxout_pieces": 3,
+                "subword_features": True,
+            },
+        }
+    }
+
+def to_example(doc, vocab):
+    """Example no vocabulário `vocab` com as palavras e entidades de `doc` como referência."""
+    words, spaces = [t.text for t in doc], [bool(t.whitespace_) for t in doc]
+    ents = [f"{t.ent_iob_}-{t.ent_type_}" if t.ent_type_ else "O" for t in doc]
+    return Example(Doc(vocab, words=words, spaces=spaces), Doc(vocab, words=words, spaces=spaces, ents=ents))
+
+def teacher_examples(teacher, titles, batch_size=1000, n_process=1):
+    """Examples cujas referências são as entidades previstas pelo professor."""
+    texts = (title for title in titles if isinstance(title, str) and title.strip())
+    return [to_example(doc, teacher.vocab) for doc in teacher.pipe(texts, batch_size=batch_size, n_process=n_process)]
+
+def cached_teacher_examples(teacher, teacher_dir, csv_path, title_column, category, cache_dir=CACHE_DIR, **kwargs):
+    """Rótulos do professor em cache, invalidados quando o CSV ou o modelo professor mudam."""
+    key = corpus_key(csv_path, f"distill-{category}-{title_column}", model_fingerprint(teacher_dir))
+    path = os.path.join(cache_dir, f"distill-{category}-{key}.spacy")
+    if os.path.exists(path):
+        print(f"Loading cached teacher corpus {path}")
+        return load_examples(teacher, path)
+    titles = []
+    for chunk in iter_table(csv_path, 50000, columns=[title_column]):
+        titles.extend(chunk[title_column].tolist())
+    examples = teacher_examples(teacher, titles, **kwargs)
+    os.makedirs(cache_dir, exist_ok=True)
+    save_examples(examples, path)
+    print(f"Saved teacher corpus {path} ({len(examples)} examples)")
+    return examples
+
+def train_student(examples, dev_examples, preset, iterations=30):
+    nlp = spacy.blank("pt")
+    ner = nlp.add_pipe("ner", config=student_model_config(**preset))
+    # Os Examples do professor são refeitos no vocabulário do aluno
+    examples = [to_example(eg.reference, nlp.vocab) for eg in examples]
+    add_labels(ner, examples)
+    optimizer = nlp.begin_training()
+    train_epochs(nlp, examples, optimizer, iterations, batch_size=(8.0, 64.0, 1.01), drop=0.2,
+                 dev_examples=dev_examples)
+    return nlp
+
+def distill_category(category, titles_csv, title_column, output_dir, presets, iterations, latency_titles,
+                     batch_sizes=(1, 64)):
+    """Treina os alunos de uma categoria e mede concordância com o professor e latência."""
+    teacher_dir = os.path.join(MODELS_DIR, CATEGORY_MODELS[category])
+    teacher = spacy.load(teacher_dir)
+    if titles_csv:
+        examples = cached_teacher_examples(teacher, teacher_dir, titles_csv, title_column, category)
+    else:
+        examples = teacher_examples(teacher, latency_titles)
+    train_examples, dev_examples = split_examples(examples)
+    os.makedirs(output_dir, exist_ok=True)
+
+    report = {"teacher": {"model": teacher_dir, "inference": bench_inference(teacher, latency_titles, batch_sizes, [1])},
+              "examples": len(train_examples), "dev_examples": len(dev_examples), "students": {}}
+    for name in presets:
+        student = train_student(train_examples, dev_examples, STUDENT_PRESETS[name], iterations)
+        # F1 do aluno tomando as entidades do professor como referência
+        scores = evaluate(student, dev_examples)
+        path = os.path.join(output_dir, f"modelo_ner_{category}_{name}")
+        student.to_disk(path)
+        report["students"][name] = {
+            "model": path,
+            "config": STUDENT_PRESETS[name],
+            "teacher_agreement_f1": round(scores["ents_f"] or 0.0, 4),
+            "per_label_f1": {label: round(s["f"], 4) for label, s in (scores.get("ents_per_type") or {}).items()},
+            "inference": bench_inference(student, latency_titles, batch_sizes, [1]),
+        }
+    return report
+
+def print_tradeoff(category, report):
+    teacher_speed = {r["batch_size"]: r["docs_per_sec"] for r in report["teacher"]["inference"]}
+    print(f"== {category}: accuracy vs latency (teacher agreement F1 on {report['dev_examples']} held-out titles)")
+    print(f"  {'model':<10} {'F1':>6}  " + "  ".join(f"bs={bs:<4} docs/s  p50ms  speedup" for bs in teacher_speed))
+    rows = [("teacher", 1.0, report["teacher"]["inference"])]
+    rows += [(name, s["teacher_agreement_f1"], s["inference"]) for name, s in report["students"].items()]
+    for name, f1, inference in rows:
+        cells = [f"{r['docs_per_sec']:10.1f} {r['p50_ms']:6.2f} {r['docs_per_sec'] / teacher_speed[r['batch_size']]:6.2f}x"
+                 for r in inference]
+        print(f"  {name:<10} {f1:6.3f}  " + "  ".join(cells))
+
+def main():
+    parser = argparse.ArgumentParser(description="Destila os modelos NER das categorias em modelos menores")
+    parser.add_argument("--categories", nargs="+", default=list(CATEGORY_MODELS))
+    parser.add_argument("--titles-csv", help="CSV com títulos sem anotação (um por categoria: use {category} no caminho)")
+    parser.add_argument("--title-column", default="title")
+    parser.add_argument("--synthetic-rows", type=int, default=5000,
+                        help="sem --titles-csv, usa títulos sintéticos do benchmark")
+    parser.add_argument("--presets", nargs="+", default=list(STUDENT_PRESETS), choices=list(STUDENT_PRESETS))
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--output-dir", default="student_models")
+    parser.add_argument("--report", default="distill_report.json")
+    args = parser.parse_args()
+
+    random.seed(0)
+    reports = {}
+    for category in args.categories:
+        frame = synthetic_frame(category, args.synthetic_rows, seed=1)
+        latency_titles = frame[SYNTHETIC_LAYOUTS[category][1]].tolist()
+        titles_csv = args.titles_csv.format(category=category) if args.titles_csv else None
+        reports[category] = distill_category(category, titles_csv, args.title_column, args.output_dir, args.presets,
+                                             args.iterations, latency_titles)
+        print_tradeoff(category, reports[category])
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(reports, f, indent=2, ensure_ascii=False)
+    print(f"Saved {args.report}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import spacy
+from ner_corpus import cached_examples
+from ner_dedup import DEDUP_THRESHOLD, collapse_duplicates
+from ner_io import iter_table, read_table
+from ner_metrics import METRICS
+from ner_parallel import load_script
+from ner_training import split_examples
+
+# Motor único de treino: cada categoria declara CSV, mapeamento de colunas, rotulador
+# (script da categoria) e modelo base; todas treinam ao mesmo tempo num pool de processos.
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOG_DIR = "training_logs"
+CHECKPOINT_DIR = "checkpoints"
+
+# base_model None = spacy.blank("pt"); caso contrário, diretório de um modelo treinado.
+# csv pode ser um CSV ou um Parquet (ver ner_io.py).
+# columns renomeia as colunas do CSV para os nomes que o rotulador espera ({"nome_no_csv": "nome_esperado"}).
+# read_columns são as colunas (já com os nomes esperados) que o rotulador usa; só elas são lidas do arquivo.
+# labeler_functions entram na versão do cache do corpus junto com prepare_training_data.
+# title_column é a coluna de títulos (depois do mapeamento), usada pelo retreino incremental.
+# dedup_threshold (opcional, padrão DEDUP_THRESHOLD) é a similaridade para colapsar quase-duplicatas;
+# null colapsa só as duplicatas exatas.
+CATEGORY_CONFIGS = {
+    "celulares": {
+        "script": "smarthpone-title-split.py",
+        "csv": "/media/paulo-jaka/Extras/Machine-learning/base-de-dados/uai2.csv",
+        "title_column": "title",
+        "columns": {},
+        "read_columns": ["title", "modelo"],
+        "labeler_functions": ["extract_entities"],
+        "base_model": None,
+        "output_dir": "modelo_ner_celulares2",
+    },
+    "notebooks": {
+        "script": "notebook-title-split.py",
+        "csv": "/media/paulo-jaka/Extras/Machine-learning/notebook_sample_training_data.csv",
+        "title_column": "titulo",
+        "columns": {},
+        "read_columns": ["titulo", "modelo", "CPU", "GPU", "RAM", "SSD"],
+        "labeler_functions": ["extract_entities"],
+        "base_model": None,
+        "output_dir": "modelo_ner_notebooks4_last",
+    },
+    "smartwatches": {
+        "script": "smartwatch-title-split.py",
+        "csv": "/media/paulo-jaka/Extras/Machine-learning/base-de-dados/smarthwatchs_dados_treino2.csv",
+        "title_column": "title",
+        "columns": {},
+        "read_columns": ["title", "brand", "modelo"],
+        "labeler_functions": ["extract_entities"],
+        "base_model": None,
+        "output_dir": "modelo_ner_smartwatches",
+    },
+    "tablets": {
+        "script": "re-training-model-tablet.py",
+        "csv": "/media/paulo-jaka/Extras/Machine-learning/base-de-dados/tablet_training_data.csv",
+        "title_column": "Título",
+        "columns": {},
+        "read_columns": ["Título", "Modelo", "RAM", "Armazenamento"],
+        "labeler_functions": ["extract_entities_from_csv"],
+        "base_model": "trained_models/modelo_ner_tablets",
+        "output_dir": "modelo_ner_tablets_retrained",
+    },
+    "tvs": {
+        "script": "tv-title-split.py",
+        "csv": "/media/paulo-jaka/Extras/Machine-learning/base-de-dados/training_data_tv2ajustado.csv",
+        "title_column": "titulo",
+        "columns": {},
+        "read_columns": ["titulo", "modelo", "polegadas", "resolucao", "tecnologia"],
+        "labeler_functions": ["extract_entities", "detect_size_fallback"],
+        "base_model": None,
+        "output_dir": "modelo_ner_tvs",
+    },
+}
+
+def load_configs(path=None):
+    """Configurações padrão, sobrescritas campo a campo pelas do arquivo JSON (se houver)."""
+    configs = {category: dict(config) for category, config in CATEGORY_CONFIGS.items()}
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for category, overrides in json.load(f).items():
+                configs.setdefault(category, {"columns": {}, "labeler_functions": [], "base_model": None})
+                configs[category].update(overrides)
+    return configs
+
+def resolve_path(path):
+    """Caminhos relativos de scripts e modelos são relativos a este diretório."""
+    return path if os.path.isabs(path) else os.path.join(MODULE_DIR, path)
+
+def source_columns(config):
+    """Nomes no arquivo das colunas de read_columns (None = todas)."""
+    read_columns = config.get("read_columns")
+    if not read_columns:
+        return None
+    source_names = {expected: source for source, expected in (config.get("columns") or {}).items()}
+    return [source_names.get(column, column) for column in read_columns]
+
+def load_category_data(config, file_path):
+    """Colunas usadas pelo rotulador (read_columns, ou todas), já renomeadas conforme `columns`."""
+    return read_table(file_path, columns=source_columns(config)).rename(columns=config.get("columns") or {})
+
+def iter_category_data(config, file_path, chunksize):
+    """Como load_category_data, mas em pedaços de `chunksize` linhas."""
+    for chunk in iter_table(file_path, chunksize, columns=source_columns(config)):
+        yield chunk.rename(columns=config.get("columns") or {})
+
+def category_examples(nlp, category, config):
+    """Script da categoria e seus Examples de treino (rotulados ou lidos do cache do corpus), sem duplicatas."""
+    module = load_script(resolve_path(config["script"]))
+    columns = config.get("columns") or {}
+
+    def load_data(file_path):
+        return load_category_data(config, file_path)
+
+    def load_chunks(file_path, chunksize):
+        return iter_category_data(config, file_path, chunksize)
+
+    labeler_functions = tuple(getattr(module, name) for name in config.get("labeler_functions", ()))
+    examples = cached_examples(nlp, config["csv"], category, module.prepare_training_data, labeler_functions,
+                               load_data=load_data, load_chunks=load_chunks,
+                               key_extra=json.dumps([columns, config.get("read_columns")], sort_keys=True))
+    examples = collapse_duplicates(examples, config.get("dedup_threshold", DEDUP_THRESHOLD), category=category)
+    return module, examples
+
+def train_category(category, config, log_dir=LOG_DIR, checkpoint_dir=None, checkpoint_every=10, resume=False):
+    """Rotula (ou lê do cache), treina e salva o modelo de uma categoria.
+
+    Com checkpoint_dir, o treino grava checkpoints em <checkpoint_dir>/<categoria> e, com
+    resume=True, continua do último checkpoint deixado por uma execução interrompida.
+
+    A saída do treino (e os avisos do spaCy) vai para <log_dir>/<categoria>.log para não misturar as categorias;
+    as métricas do processo vão para <log_dir>/<categoria>.metrics.json.
+    """
+    start = time.perf_counter()
+    # Processos do pool podem treinar mais de uma categoria
+    METRICS.reset()
+    os.makedirs(log_dir, exist_ok=True)
+    with open(os.path.join(log_dir, f"{category}.log"), "w", encoding="utf-8") as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        base_model = config.get("base_model")
+        nlp = spacy.load(resolve_path(base_model)) if base_model else spacy.blank("pt")
+        module, examples = category_examples(nlp, category, config)
+
+        train_examples, dev_examples = split_examples(examples)
+        kwargs = {"iterations": config["iterations"]} if "iterations" in config else {}
+        if checkpoint_dir:
+            kwargs.update(checkpoint_dir=os.path.join(checkpoint_dir, category), checkpoint_every=checkpoint_every,
+                          resume=resume)
+        # Scripts que retreinam alteram o nlp recebido e não o devolvem
+        nlp = module.train_model(nlp, train_examples, dev_examples=dev_examples, **kwargs) or nlp
+        nlp.to_disk(config["output_dir"])
+    METRICS.write(os.path.join(log_dir, f"{category}.metrics.json"))
+    return {"category": category, "examples": len(examples), "output_dir": config["output_dir"],
+            "seconds": round(time.perf_counter() - start, 2)}
+
+def train_all(configs, categories=None, workers=None, log_dir=LOG_DIR, checkpoint_dir=None, checkpoint_every=10,
+              resume=False):
+    """Treina as categorias em paralelo, um processo por categoria (até `workers`)."""
+    categories = categories or list(configs)
+    unknown = [category for category in categories if category not in configs]
+    if unknown:
+        raise ValueError(f"Unknown categories: {', '.join(unknown)}")
+
+    results, failures = [], {}
+    with ProcessPoolExecutor(max_workers=workers or len(categories)) as pool:
+        futures = {pool.submit(train_category, category, configs[category], log_dir, checkpoint_dir, checkpoint_every,
+                               resume): category
+                   for category in categories}
+        for future in as_completed(futures):
+            category = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # Uma categoria com erro não interrompe as demais
+                failures[category] = repr(e)
+                print(f"{category}: FAILED ({e!r}), see {os.path.join(log_dir, category + '.log')}")
+                continue
+            results.append(result)
+            print(f"{category}: {result['examples']} examples, {result['seconds']:.2f}s -> {result['output_dir']}")
+    return results, failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Treina ou retreina os modelos NER de todas as categorias")
+    parser.add_argument("--config", help="JSON com configurações por categoria (sobrescreve as padrão)")
+    parser.add_argument("--categories", nargs="+", help="categorias a treinar (padrão: todas)")
+    parser.add_argument("--workers", type=int, default=None, help="processos simultâneos (padrão: um por categoria)")
+    parser.add_argument("--log-dir", default=LOG_DIR)
+    parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR, help="checkpoints do treino, um diretório por categoria")
+    parser.add_argument("--checkpoint-every", type=int, default=10, help="iterações entre checkpoints")
+    parser.add_argument("--no-checkpoints", action="store_true")
+    parser.add_argument("--resume", action="store_true", help="continua do último checkpoint de cada categoria")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    checkpoint_dir = None if args.no_checkpoints else args.checkpoint_dir
+    results, failures = train_all(load_configs(args.config), args.categories, args.workers, args.log_dir,
+                                  checkpoint_dir, args.checkpoint_every, args.resume)
+    print(f"Trained {len(results)} categories in {time.perf_counter() - start:.2f}s")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+import pandas as pd
+import spacy
+from ner_cache import normalize_title
+from ner_corpus import load_examples, save_examples
+from ner_engine import load_category_data, load_configs, resolve_path
+from ner_parallel import load_script
+from ner_training import add_labels, make_examples, split_examples, train_epochs
+
+# Retreino incremental: o CSV novo é comparado com um manifesto dos títulos já treinados
+# e só as linhas novas ou alteradas viram exemplos, misturadas com uma amostra limitada
+# (reservatório) de exemplos antigos para o modelo não esquecer o que já sabia.
+#
+# Estado em <state-dir>: manifest.sqlite (título -> hash da linha), rehearsal.spacy e state.json.
+
+def row_hashes(df):
+    """Hash de cada linha inteira: muda quando qualquer coluna (modelo, RAM...) muda."""
+    return [format(value, "016x") for value in pd.util.hash_pandas_object(df, index=False)]
+
+class Manifest:
+    """Títulos já usados no treino e o hash da linha de cada um, em SQLite."""
+
+    def __init__(self, db_path):
+        self.db = sqlite3.connect(db_path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS rows (title TEXT PRIMARY KEY, hash TEXT NOT NULL)")
+
+    def changed(self, titles, hashes):
+        """Máscara das linhas novas ou com conteúdo diferente do manifesto."""
+        self.db.execute("CREATE TEMP TABLE incoming (title TEXT, hash TEXT)")
+        self.db.executemany("INSERT INTO incoming VALUES (?, ?)", zip(titles, hashes))
+        changed = {title for (title,) in self.db.execute(
+            "SELECT i.title FROM incoming i LEFT JOIN rows r ON r.title = i.title "
+            "WHERE r.hash IS NULL OR r.hash != i.hash")}
+        self.db.execute("DROP TABLE incoming")
+        return [title in changed for title in titles]
+
+    def update(self, titles, hashes):
+        self.db.executemany("INSERT OR REPLACE INTO rows VALUES (?, ?)", zip(titles, hashes))
+        self.db.commit()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Rehearsal:
+    """Amostra uniforme (reservoir sampling) de no máximo `max_size` exemplos já treinados.
+
+    O estado do gerador aleatório fica em state.json junto com `seen`, para que cada
+    execução continue a sequência de sorteios da anterior em vez de repeti-la.
+    """
+
+    def __init__(self, state_dir, max_size=5000, seed=0):
+        self.path = os.path.join(state_dir, "rehearsal.spacy")
+        self.state_path = os.path.join(state_dir, "state.json")
+        self.max_size = max_size
+        self.rng = random.Random(seed)
+        self.seen = 0
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding="utf-8") as f:
+                state = json.load(f)
+            self.seen = state["seen"]
+            if "rng" in state:
+                version, internal, gauss_next = state["rng"]
+                self.rng.setstate((version, tuple(internal), gauss_next))
+
+    def load(self, nlp):
+        return load_examples(nlp, self.path) if os.path.exists(self.path) else []
+
+    def discard(self, reservoir, titles):
+        """Reservatório sem os exemplos dos títulos (normalizados) em `titles`.
+
+        Usado com os títulos novos ou alterados: a anotação antiga de uma linha corrigida
+        não pode voltar no ensaio ao lado da correção.
+        """
+        titles = set(titles)
+        return [example for example in reservoir if normalize_title(example.reference.text) not in titles]
+
+    def sample(self, examples, n):
+        return self.rng.sample(examples, min(n, len(examples)))
+
+    def add(self, reservoir, new_examples):
+        """Reservatório atualizado com os exemplos novos (cada exemplo visto tem a mesma chance de ficar)."""
+        reservoir = list(reservoir)
+        for example in new_examples:
+            self.seen += 1
+            if len(reservoir) < self.max_size:
+                reservoir.append(example)
+            else:
+                slot = self.rng.randrange(self.seen)
+                if slot < self.max_size:
+                    reservoir[slot] = example
+        return reservoir
+
+    def save(self, reservoir):
+        save_examples(reservoir, self.path)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"seen": self.seen, "rng": self.rng.getstate()}, f)
+        os.replace(tmp_path, self.state_path)
+
+def load_category_frame(config, csv_path):
+    """Linhas do CSV (uma por título normalizado, a última vence), os títulos e os hashes das linhas.
+
+    Só as colunas do rotulador (read_columns) entram no hash: mudanças nas outras não geram retreino.
+    """
+    df = load_category_data(config, csv_path)
+    keys = pd.Series([normalize_title(title) for title in df[config["title_column"]]], index=df.index)
+    df = df[~keys.duplicated(keep="last")]
+    return df, keys[df.index].tolist(), row_hashes(df)
+
+def retrain(nlp, examples, dev_examples, epochs):
+    """Poucas passadas a partir do modelo existente (mesmo esquema dos scripts de retreino)."""
+    ner = nlp.get_pipe("ner")
+    add_labels(ner, examples)
+    other_pipes = [pipe for pipe in nlp.pipe_names if pipe != "ner"]
+    with nlp.disable_pipes(*other_pipes):
+        optimizer = nlp.resume_training()
+        train_epochs(nlp, examples, optimizer, epochs, batch_size=(8.0, 32.0, 1.01), drop=0.3,
+                     dev_examples=dev_examples, eval_every=1, patience=2)
+
+def incremental_update(category, config, csv_path, model_dir, output_dir, state_dir, epochs=5,
+                       rehearsal_size=5000, rehearsal_ratio=1.0, bootstrap=False):
+    """Treina só as linhas novas/alteradas do CSV (com ensaio) e atualiza manifesto e reservatório.
+
+    Com bootstrap=True nada é treinado: o CSV (os dados do treino original) só é
+    registrado no manifesto e no reservatório.
+    """
+    start = time.perf_counter()
+    os.makedirs(state_dir, exist_ok=True)
+    module = load_script(resolve_path(config["script"]))
+    nlp = spacy.load(model_dir)
+    df, titles, hashes = load_category_frame(config, csv_path)
+    rehearsal = Rehearsal(state_dir, rehearsal_size)
+
+    with Manifest(os.path.join(state_dir, "manifest.sqlite")) as manifest:
+        mask = manifest.changed(titles, hashes)
+        new_df = df[mask]
+        print(f"{category}: {len(df)} rows, {len(new_df)} new or changed, {len(manifest)} in manifest")
+        if new_df.empty:
+            print("Nothing to retrain")
+            return None
+
+        new_examples = make_examples(nlp, module.prepare_training_data(new_df.copy()), category)
+        changed_titles = [title for title, use in zip(titles, mask) if use]
+        reservoir = rehearsal.discard(rehearsal.load(nlp), changed_titles)
+        if not bootstrap:
+            old_examples = rehearsal.sample(reservoir, int(len(new_examples) * rehearsal_ratio))
+            train_examples, dev_examples = split_examples(new_examples)
+            print(f"Training on {len(train_examples)} new + {len(old_examples)} rehearsal examples "
+                  f"for {epochs} epochs")
+            # Avaliação no que é novo e numa parte do ensaio, para medir também o esquecimento
+            rehearsal_train, rehearsal_dev = split_examples(old_examples)
+            retrain(nlp, train_examples + rehearsal_train, dev_examples + rehearsal_dev, epochs)
+            nlp.to_disk(output_dir)
+
+        # Manifesto e reservatório só mudam depois que o modelo foi salvo
+        rehearsal.save(rehearsal.add(reservoir, new_examples))
+        manifest.update(changed_titles, [h for h, use in zip(hashes, mask) if use])
+    elapsed = time.perf_counter() - start
+    print(f"{'Bootstrapped' if bootstrap else 'Retrained'} {category} in {elapsed:.2f}s")
+    return {"rows": len(df), "changed": len(new_df), "examples": len(new_examples), "seconds": round(elapsed, 2)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Retreino incremental: só linhas novas/alteradas, com ensaio de exemplos antigos")
+    parser.add_argument("category")
+    parser.add_argument("csv", help="CSV de treino atualizado da categoria")
+    parser.add_argument("--model", required=True, help="modelo atual (ponto de partida)")
+    parser.add_argument("--output", help="onde salvar o modelo retreinado")
+    parser.add_argument("--config", help="JSON com configurações por categoria (ver ner_engine.py)")
+    parser.add_argument("--state-dir", help="manifesto e reservatório (padrão: incremental_state/<categoria>)")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--rehearsal-size", type=int, default=5000, help="exemplos antigos guardados")
+    parser.add_argument("--rehearsal-ratio", type=float, default=1.0, help="exemplos antigos por exemplo novo")
+    parser.add_argument("--bootstrap", action="store_true",
+                        help="só registra o CSV com que o modelo já foi treinado, sem treinar")
+    args = parser.parse_args()
+    if not args.bootstrap and not args.output:
+        parser.error("--output is required unless --bootstrap")
+
+    config = load_configs(args.config)[args.category]
+    state_dir = args.state_dir or os.path.join("incremental_state", args.category)
+    incremental_update(args.category, config, args.csv, args.model, args.output, state_dir, args.epochs,
+                       args.rehearsal_size, args.rehearsal_ratio, args.bootstrap)
+
+if __name__ == "__main__":
+    main()
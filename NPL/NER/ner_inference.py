@@ -0,0 +1,281 @@
+import hashlib
+import json
+import os
+import re
+import time
+from collections import deque
+import pandas as pd
+import spacy
+from ner_cache import normalize_title
+from ner_io import TableWriter, is_parquet, iter_table
+from ner_metrics import METRICS
+
+def load_model(model_dir):
+    """Carrega o modelo NER existente."""
+    return spacy.load(model_dir)
+
+def extract_entities_stream(nlp, titles, batch_size=1000, n_process=1):
+    """Extrai entidades de um iterável de títulos com nlp.pipe, mantendo a ordem de entrada.
+
+    O modelo é determinístico, então cada título passa pelo pipeline uma única vez.
+    O timer "inference" mede só o nlp.pipe: o tempo gasto produzindo os títulos (leitura do
+    CSV, cache etc.) é descontado.
+    """
+    upstream = [0.0]
+
+    def texts():
+        iterator = iter(titles)
+        while True:
+            start = time.perf_counter()
+            try:
+                title = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                upstream[0] += time.perf_counter() - start
+            # Valores nulos (NaN) viram string vazia para não quebrar o tokenizer
+            yield title if isinstance(title, str) else ''
+
+    docs = iter(nlp.pipe(texts(), batch_size=batch_size, n_process=n_process))
+    while True:
+        start, upstream[0] = time.perf_counter(), 0.0
+        try:
+            doc = next(docs)
+        except StopIteration:
+            return
+        METRICS.add_time("inference", time.perf_counter() - start - upstream[0])
+        METRICS.count("inference_docs")
+        yield {ent.label_: ent.text for ent in doc.ents}
+
+def extract_ram(title):
+    """Extrai RAM usando regex, procurando pela palavra 'RAM' (case insensitive)."""
+    match = re.search(r"(\d+)\s*GB\s*RAM", title, re.IGNORECASE)
+    if match:
+        return match.group(1) + " GB"
+    return None
+
+def extract_storage_capacity(title):
+    """Extrai armazenamento usando regex, procurando valores seguidos de 'GB' e maiores que 16."""
+    match = re.search(r"(\d+)\s*GB", title, re.IGNORECASE)
+    if match and int(match.group(1)) > 16:
+        return match.group(1) + " GB"
+    return None
+
+def apply_regex_fallbacks(title, entities_found):
+    """Completa RAM e Armazenamento com regex quando o modelo não os encontrou."""
+    with METRICS.timer("regex_fallback"):
+        # Se RAM não foi encontrado, tenta com regex
+        if 'RAM' not in entities_found:
+            ram_regex = extract_ram(title)
+            if ram_regex:
+                entities_found['RAM'] = ram_regex
+                METRICS.count("regex_fallback_hits", label='RAM')
+
+        # Se Armazenamento não foi encontrado, tenta com regex
+        if 'STORAGE' not in entities_found:
+            storage_regex = extract_storage_capacity(title)
+            if storage_regex:
+                entities_found['STORAGE'] = storage_regex
+                METRICS.count("regex_fallback_hits", label='STORAGE')
+
+    return entities_found
+
+def extract_title_entities(nlp, titles, cache=None, batch_size=1000, n_process=1, rules=None):
+    """Extrai entidades (modelo + fallbacks de regex) de cada título, na ordem de entrada.
+
+    Com um TitleCache, títulos repetidos são respondidos pelo cache e só os
+    títulos inéditos passam pelo modelo. Com uma RuleStage (ner_rules), os títulos
+    cujos campos as regras resolvem com confiança não passam pelo modelo; nos demais,
+    os campos resolvidos pelas regras têm prioridade sobre os do modelo.
+    """
+    # Fila com (texto, resultado pronto ou campos das regras, origem) na ordem de entrada
+    pending = deque()
+    # Títulos que estão no modelo agora -> quantas repetições esperam pelo resultado
+    inflight = {}
+    resolved = {}
+
+    def resolve_by_rules(text):
+        """Campos resolvidos pelas regras e se eles bastam para pular o modelo."""
+        if rules is None:
+            return None, False
+        with METRICS.timer("rule_stage"):
+            confident = rules.resolve(text)
+        if rules.covers(confident):
+            METRICS.count("cascade_titles", path='rules')
+            return confident, True
+        METRICS.count("cascade_titles", path='model_partial' if confident else 'model')
+        return confident, False
+
+    def misses():
+        for title in titles:
+            if cache is None:
+                text = title if isinstance(title, str) else ''
+                confident, covered = resolve_by_rules(text)
+                pending.append((text, confident, 'rules' if covered else 'model'))
+                if not covered:
+                    yield text
+                continue
+
+            text = normalize_title(title)
+            if text in inflight:
+                # Repetição de um título que ainda está no lote do modelo
+                inflight[text] += 1
+                cache.hits += 1
+                pending.append((text, None, 'repeat'))
+                continue
+
+            cached = cache.get(text)
+            if cached is not None:
+                pending.append((text, cached, 'cache'))
+                continue
+            confident, covered = resolve_by_rules(text)
+            if covered:
+                pending.append((text, confident, 'rules'))
+            else:
+                inflight[text] = 0
+                pending.append((text, confident, 'model'))
+                yield text
+
+    def drain_until_model():
+        while pending and pending[0][2] != 'model':
+            text, cached, origin = pending.popleft()
+            if origin == 'cache':
+                yield cached
+            elif origin == 'rules':
+                yield dict(cached)
+            else:
+                entities = resolved[text]
+                inflight[text] -= 1
+                if inflight[text] == 0:
+                    del inflight[text], resolved[text]
+                yield dict(entities)
+
+    for entities_found in extract_entities_stream(nlp, misses(), batch_size=batch_size, n_process=n_process):
+        yield from drain_until_model()
+        text, confident, _ = pending.popleft()
+        if confident:
+            entities_found.update(confident)
+        entities_found = apply_regex_fallbacks(text, entities_found)
+        if cache is not None:
+            cache.put(text, entities_found)
+            if inflight[text]:
+                resolved[text] = dict(entities_found)
+            else:
+                del inflight[text]
+        yield entities_found
+
+    yield from drain_until_model()
+
+def to_result_row(title, entities_found):
+    """Linha de saída da extração no formato usado pelos CSVs de resultado."""
+    return {
+        'Título': title,
+        'Modelo': entities_found.get('MODEL', None),
+        'RAM': entities_found.get('RAM', None),
+        'Armazenamento': entities_found.get('STORAGE', None),
+    }
+
+def stream_identity(csv_path, title_column, model_id):
+    """O que precisa ser igual para retomar: o arquivo de entrada (caminho, tamanho, mtime), a coluna e o modelo."""
+    stat = os.stat(csv_path)
+    return {'input': os.path.abspath(csv_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'title_column': title_column, 'model': model_id}
+
+def read_offset(output_path, identity=None):
+    """Linhas já gravadas e tamanho do arquivo confirmado na última gravação (ou None).
+
+    Um offset de outra entrada ou de outro modelo (identity diferente) é ignorado.
+    """
+    offset_path = output_path + '.offset'
+    if not os.path.exists(offset_path) or not os.path.exists(output_path):
+        return None
+    with open(offset_path, encoding='utf-8') as f:
+        offset = json.load(f)
+    if identity is not None and offset.get('identity') != identity:
+        print(f"Ignoring {offset_path}: it was written for a different input or model")
+        return None
+    return offset
+
+def write_offset(output_path, rows, size, identity=None):
+    """Grava de forma atômica o progresso do streaming ao lado do CSV de saída."""
+    tmp_path = output_path + '.offset.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'rows': rows, 'bytes': size, 'identity': identity}, f)
+    os.replace(tmp_path, output_path + '.offset')
+
+def stream_csv(nlp, csv_path, output_path, title_column='title', chunksize=10000, cache=None,
+               batch_size=1000, n_process=1, resume=True, rules=None, model_id=None):
+    """Extrai entidades de um CSV de qualquer tamanho com memória constante.
+
+    O CSV é lido em pedaços de `chunksize` linhas e cada pedaço é anexado ao CSV de saída
+    assim que fica pronto. Com resume=True, uma execução interrompida continua da última
+    linha confirmada no arquivo `<saída>.offset`, desde que a entrada e o modelo (`model_id`,
+    ex.: model_fingerprint do diretório; por padrão um hash dos pesos do nlp) sejam os mesmos.
+    O offset é apagado quando o streaming termina.
+    Entrada e saída podem ser Parquet (ver ner_io.py): a entrada é lida row group a row group
+    e só com a coluna de títulos; a saída Parquet é gravada em `<saída>.tmp` e só recebe o
+    nome final no fim, então não há retomada (uma execução interrompida recomeça do zero).
+    """
+    parquet_output = is_parquet(output_path)
+    identity = None
+    if resume and not parquet_output:
+        model_id = model_id or hashlib.sha256(nlp.to_bytes()).hexdigest()[:16]
+        identity = stream_identity(csv_path, title_column, model_id)
+    offset = read_offset(output_path, identity) if identity else None
+    done = offset['rows'] if offset else 0
+    if offset:
+        # Descarta qualquer pedaço gravado depois da última confirmação
+        with open(output_path, 'r+b') as f:
+            f.truncate(offset['bytes'])
+    elif os.path.exists(output_path) and not parquet_output:
+        # Um Parquet existente só é substituído no os.replace final
+        os.remove(output_path)
+
+    reader = iter_table(csv_path, chunksize, columns=[title_column], skip_rows=done)
+    writer = TableWriter(output_path + '.tmp', parquet=True) if parquet_output else None
+    # Títulos dos pedaços lidos pelo pipeline que ainda não foram gravados
+    chunks = deque()
+
+    def titles():
+        for chunk in METRICS.timed_iter("csv_load", reader):
+            chunks.append(chunk[title_column].tolist())
+            yield from chunks[-1]
+
+    rows = []
+    for entities_found in extract_title_entities(nlp, titles(), cache=cache, batch_size=batch_size, n_process=n_process,
+                                                 rules=rules):
+        rows.append(entities_found)
+        if len(rows) < len(chunks[0]):
+            continue
+
+        results_df = pd.DataFrame([to_result_row(title, entities) for title, entities in zip(chunks.popleft(), rows)])
+        if writer is not None:
+            writer.write(results_df)
+            done += len(rows)
+        else:
+            with open(output_path, 'a', encoding='utf-8', newline='') as f:
+                results_df.to_csv(f, header=(done == 0), index=False)
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+            done += len(rows)
+            write_offset(output_path, done, size, identity)
+        METRICS.count("output_rows", len(rows))
+        METRICS.sample_rss("stream_csv")
+        METRICS.export(min_interval=5.0)
+        rows = []
+
+    if done == 0:
+        # Entrada sem linhas: a saída ainda é uma tabela válida, só com as colunas
+        empty_df = pd.DataFrame(columns=list(to_result_row('', {})))
+        if writer is not None:
+            writer.write(empty_df)
+        else:
+            empty_df.to_csv(output_path, index=False)
+    if writer is not None:
+        writer.close()
+        os.replace(output_path + '.tmp', output_path)
+    elif os.path.exists(output_path + '.offset'):
+        # Saída completa: uma próxima execução começa do zero
+        os.remove(output_path + '.offset')
+    return done
@@ -0,0 +1,148 @@
+import argparse
+import os
+import time
+import pandas as pd
+
+# Leitura e escrita de tabelas pela extensão do arquivo: .parquet/.pq usam pyarrow (colunar,
+# tipado e comprimido; só as colunas pedidas saem do disco e os row groups são lidos um a um),
+# qualquer outra extensão continua sendo CSV. pyarrow só é importado quando há Parquet.
+#
+#   python ner_io.py convert catalogo.csv catalogo.parquet --columns titulo modelo
+
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+
+def is_parquet(path):
+    return str(path).lower().endswith(PARQUET_EXTENSIONS)
+
+def read_table(path, columns=None):
+    """DataFrame inteiro do CSV ou Parquet, só com `columns` (None = todas), nessa ordem."""
+    if is_parquet(path):
+        return pd.read_parquet(path, columns=columns)
+    df = pd.read_csv(path, usecols=columns)
+    return df[columns] if columns else df
+
+def iter_table(path, chunksize=50000, columns=None, skip_rows=0, dtype=None):
+    """DataFrames de até `chunksize` linhas, pulando as `skip_rows` primeiras.
+
+    No Parquet, os row groups anteriores a `skip_rows` nem são lidos. `dtype` só vale para
+    CSV (o Parquet já é tipado): sem ele, o pandas infere os tipos de cada pedaço separadamente.
+    """
+    if not is_parquet(path):
+        yield from pd.read_csv(path, chunksize=chunksize, usecols=columns, skiprows=range(1, skip_rows + 1),
+                               dtype=dtype)
+        return
+
+    import pyarrow.parquet as pq
+    parquet = pq.ParquetFile(path)
+    row_groups, first_row = [], 0
+    for index in range(parquet.num_row_groups):
+        num_rows = parquet.metadata.row_group(index).num_rows
+        if first_row + num_rows > skip_rows:
+            row_groups.append(index)
+        else:
+            first_row += num_rows
+    skip = skip_rows - first_row
+    for batch in parquet.iter_batches(batch_size=chunksize, row_groups=row_groups, columns=columns):
+        if skip >= batch.num_rows:
+            skip -= batch.num_rows
+            continue
+        if skip:
+            batch, skip = batch.slice(skip), 0
+        yield batch.to_pandas()
+
+class TableWriter:
+    """Grava DataFrames em sequência num CSV (anexando) ou num Parquet (um row group por DataFrame).
+
+    O formato vem da extensão de `path`, a não ser que `parquet` seja informado. O Parquet
+    só fica legível depois de close(), quando o rodapé é gravado. O schema do Parquet vem do
+    primeiro DataFrame; um pedaço posterior com uma coluna de outro tipo que não possa ser
+    convertida gera ValueError com o nome da coluna.
+    """
+
+    def __init__(self, path, compression="zstd", parquet=None):
+        self.path = path
+        self.parquet = is_parquet(path) if parquet is None else parquet
+        self.compression = compression
+        self.writer = None
+        self.schema = None
+        self.header = True
+
+    def write(self, df):
+        if not self.parquet:
+            df.to_csv(self.path, mode="w" if self.header else "a", header=self.header, index=False)
+            self.header = False
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self.writer is None:
+            # Colunas só com nulos no primeiro pedaço viram texto, senão os pedaços seguintes não caberiam no schema
+            self.schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                                     for field in table.schema])
+            self.writer = pq.ParquetWriter(self.path, self.schema, compression=self.compression)
+        self.writer.write_table(self.conform(table))
+
+    def conform(self, table):
+        """`table` com os tipos do schema do arquivo."""
+        import pyarrow as pa
+        if table.schema.names != self.schema.names:
+            raise ValueError(f"{self.path}: columns {table.schema.names} do not match {self.schema.names}")
+        columns = []
+        for field, column in zip(self.schema, table.columns):
+            if column.type == field.type:
+                columns.append(column)
+                continue
+            try:
+                columns.append(column.cast(field.type))
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                raise ValueError(f"{self.path}: column {field.name!r} is {column.type} in this chunk but "
+                                 f"{field.type} in the file ({e})") from e
+        return pa.Table.from_arrays(columns, schema=self.schema)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def convert(input_path, output_path, columns=None, chunksize=100000, infer_types=False):
+    """Converte CSV <-> Parquet em pedaços, com memória limitada a um pedaço.
+
+    As colunas de um CSV são lidas como texto, para que todos os pedaços tenham o mesmo tipo;
+    com infer_types=True o pandas infere os tipos, e um pedaço que não bate com o primeiro
+    interrompe a conversão com o nome da coluna.
+    """
+    start = time.perf_counter()
+    rows = 0
+    with TableWriter(output_path) as writer:
+        for chunk in iter_table(input_path, chunksize, columns, dtype=None if infer_types else str):
+            writer.write(chunk)
+            rows += len(chunk)
+        if rows == 0:
+            # Entrada sem linhas: grava só as colunas
+            writer.write(read_table(input_path, columns))
+    elapsed = time.perf_counter() - start
+    print(f"{rows} rows in {elapsed:.2f}s: {os.path.getsize(input_path) / 2 ** 20:.1f}MB -> "
+          f"{os.path.getsize(output_path) / 2 ** 20:.1f}MB")
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Converte tabelas entre CSV e Parquet")
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert_parser = commands.add_parser("convert", help="converte em pedaços (cada pedaço vira um row group)")
+    convert_parser.add_argument("input")
+    convert_parser.add_argument("output")
+    convert_parser.add_argument("--columns", nargs="+", help="colunas mantidas (padrão: todas)")
+    convert_parser.add_argument("--chunksize", type=int, default=100000, help="linhas por row group")
+    convert_parser.add_argument("--infer-types", action="store_true",
+                                help="infere os tipos das colunas do CSV em vez de gravá-las como texto")
+    args = parser.parse_args()
+    convert(args.input, args.output, args.columns, args.chunksize, args.infer_types)
+
+if __name__ == "__main__":
+    main()
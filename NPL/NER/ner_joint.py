@@ -0,0 +1,139 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+import spacy
+from ner_benchmark import SYNTHETIC_LAYOUTS, synthetic_frame
+from ner_engine import category_examples, load_configs
+from ner_metrics import current_rss_bytes
+from ner_router import CATEGORY_MODELS, MODELS_DIR, ModelRouter, joint_category_models
+from ner_training import add_labels, evaluate, split_examples, train_epochs
+
+# Modelo conjunto: um único NER (um só tok2vec e um só vocabulário) treinado com a união
+# dos corpora e dos rótulos das cinco categorias, comparado com os cinco modelos separados.
+
+def train_joint(configs, categories, iterations=30, seed=0):
+    """Treina o modelo conjunto; retorna o nlp e os Examples de avaliação de cada categoria."""
+    nlp = spacy.blank("pt")
+    ner = nlp.add_pipe("ner")
+    train_examples, dev_by_category = [], {}
+    for category in categories:
+        _, examples = category_examples(nlp, category, configs[category])
+        train, dev = split_examples(examples, seed=seed)
+        train_examples.extend(train)
+        dev_by_category[category] = dev
+        print(f"{category}: {len(train)} train / {len(dev)} dev examples")
+
+    add_labels(ner, train_examples)
+    print(f"Labels: {', '.join(sorted(ner.labels))}")
+    optimizer = nlp.begin_training()
+    dev_examples = [eg for dev in dev_by_category.values() for eg in dev]
+    train_epochs(nlp, train_examples, optimizer, iterations, dev_examples=dev_examples)
+    return nlp, dev_by_category
+
+def parameter_count(nlp):
+    total = 0
+    for _, proc in nlp.pipeline:
+        for node in proc.model.walk():
+            for name in node.param_names:
+                if node.has_param(name):
+                    total += node.get_param(name).size
+    return total
+
+def directory_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+def load_footprint(model_dirs):
+    """Memória (RSS), parâmetros e strings para carregar os modelos (roda num processo novo)."""
+    before = current_rss_bytes()
+    models = [spacy.load(model_dir) for model_dir in model_dirs]
+    after = current_rss_bytes()
+    return {
+        "models": len(models),
+        "rss_bytes": after - before if before is not None else None,
+        "parameters": sum(parameter_count(nlp) for nlp in models),
+        "strings": sum(len(nlp.vocab.strings) for nlp in models),
+        "disk_bytes": sum(directory_bytes(model_dir) for model_dir in model_dirs),
+    }
+
+def measure_footprint(model_dirs):
+    # Processo "spawn" para medir só o que os modelos ocupam, sem herdar a memória deste processo
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(load_footprint, model_dirs).result()
+
+def mixed_titles(categories, rows_per_category, seed=0):
+    """Pares (categoria, título) sintéticos das categorias, embaralhados como num feed real."""
+    pairs = []
+    for category in categories:
+        frame = synthetic_frame(category, rows_per_category, seed)
+        pairs.extend((category, title) for title in frame[SYNTHETIC_LAYOUTS[category][1]])
+    random.Random(seed).shuffle(pairs)
+    return pairs
+
+def routed_throughput(category_models, pairs, batch_size=256):
+    """titles/s do ModelRouter (os modelos são carregados antes de medir)."""
+    router = ModelRouter(category_models=category_models, batch_size=batch_size)
+    for category in {category for category, _ in pairs}:
+        router.get_model(category)
+    start = time.perf_counter()
+    for _ in router.route(pairs):
+        pass
+    return round(len(pairs) / (time.perf_counter() - start), 1)
+
+def compare(joint_dir, categories, dev_by_category, rows_per_category):
+    separate_dirs = [os.path.join(MODELS_DIR, CATEGORY_MODELS[category]) for category in categories]
+    joint = spacy.load(joint_dir)
+    accuracy = {}
+    for category, model_dir in zip(categories, separate_dirs):
+        separate_f = evaluate(spacy.load(model_dir), dev_by_category[category])["ents_f"] or 0.0
+        joint_f = evaluate(joint, dev_by_category[category])["ents_f"] or 0.0
+        accuracy[category] = {"separate_f1": round(separate_f, 4), "joint_f1": round(joint_f, 4)}
+
+    pairs = mixed_titles(categories, rows_per_category)
+    return {
+        "accuracy": accuracy,
+        "footprint": {"separate": measure_footprint(separate_dirs), "joint": measure_footprint([joint_dir])},
+        "titles_per_sec": {
+            "separate": routed_throughput({c: CATEGORY_MODELS[c] for c in categories}, pairs),
+            "joint": routed_throughput(joint_category_models(joint_dir, categories), pairs),
+        },
+    }
+
+def print_comparison(report):
+    print(f"{'category':<14} {'separate F1':>12} {'joint F1':>10}")
+    for category, scores in report["accuracy"].items():
+        print(f"{category:<14} {scores['separate_f1']:12.3f} {scores['joint_f1']:10.3f}")
+    separate, joint = report["footprint"]["separate"], report["footprint"]["joint"]
+    for key in ("rss_bytes", "parameters", "strings", "disk_bytes"):
+        ratio = f"{joint[key] / separate[key]:.2f}x" if separate[key] else "-"
+        print(f"{key:<14} {separate[key]:>12} {joint[key]:>10}  {ratio}")
+    speed = report["titles_per_sec"]
+    print(f"{'titles/s':<14} {speed['separate']:>12} {speed['joint']:>10}  {speed['joint'] / speed['separate']:.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Treina um NER conjunto das cinco categorias e compara com os modelos separados")
+    parser.add_argument("--config", help="JSON com configurações por categoria (ver ner_engine.py)")
+    parser.add_argument("--categories", nargs="+", default=list(CATEGORY_MODELS))
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--output-dir", default="modelo_ner_joint")
+    parser.add_argument("--compare-rows", type=int, default=2000, help="títulos sintéticos por categoria na medição de vazão")
+    parser.add_argument("--report", default="joint_report.json")
+    args = parser.parse_args()
+
+    random.seed(0)
+    configs = load_configs(args.config)
+    nlp, dev_by_category = train_joint(configs, args.categories, args.iterations)
+    nlp.to_disk(args.output_dir)
+    print(f"Saved {args.output_dir}")
+
+    report = compare(args.output_dir, args.categories, dev_by_category, args.compare_rows)
+    print_comparison(report)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {args.report}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import pandas as pd
+from ner_patterns import leading_number, literal_pattern
+
+# Rotulagem por coluna: cada etapa percorre a coluna inteira de títulos de uma vez,
+# em vez de montar uma Series por linha com df.iterrows().
+
+def pattern_spans(texts, pattern, mask=None):
+    """Candidatos (início, fim) de uma regex compilada para cada título da coluna."""
+    if mask is None:
+        return [[m.span() for m in pattern.finditer(text)] for text in texts]
+    return [[m.span() for m in pattern.finditer(text)] if use else [] for text, use in zip(texts, mask)]
+
+def row_pattern_spans(texts, patterns):
+    """Candidatos de uma regex diferente por linha (ex.: polegadas informadas no CSV)."""
+    return [[m.span() for m in pattern.finditer(text)] for text, pattern in zip(texts, patterns)]
+
+def literal_spans(texts, values):
+    """Candidatos do valor literal de cada linha; valores nulos não geram candidatos."""
+    return [
+        [] if value is None or pd.isna(value) else [m.span() for m in literal_pattern(str(value)).finditer(text)]
+        for text, value in zip(texts, values)
+    ]
+
+def pick_values(texts, pattern, largest=False, accept=None, mask=None):
+    """Escolhe, por linha, o valor encontrado pela regex com o menor (ou maior) número.
+
+    Em empate vence a primeira ocorrência no título. Linhas sem valor (ou fora da
+    máscara) recebem None.
+    """
+    choose = max if largest else min
+    if mask is None:
+        mask = [True] * len(texts)
+    picked = []
+    for text, use in zip(texts, mask):
+        values = pattern.findall(text) if use else []
+        if accept is not None:
+            values = [value for value in values if accept(value)]
+        picked.append(choose(values, key=leading_number) if values else None)
+    return picked
+
+def resolve_entities(entity_lists, candidates, label):
+    """Adiciona em cada linha o primeiro candidato que não sobrepõe as entidades já escolhidas.
+
+    Retorna uma máscara indicando em quais linhas o rótulo foi encontrado.
+    """
+    found = []
+    for entities, spans in zip(entity_lists, candidates):
+        for start, end in spans:
+            if not any(e_start < end and start < e_end for e_start, e_end, _ in entities):
+                entities.append((start, end, label))
+                found.append(True)
+                break
+        else:
+            found.append(False)
+    return found
+
+def to_training_data(texts, entity_lists):
+    """Monta a lista (texto, {"entities": [...]}) descartando títulos sem entidades."""
+    return [(text, {"entities": entities}) for text, entities in zip(texts, entity_lists) if entities]
+
+def snap_entities(doc, entities):
+    """Alinha as entidades (início, fim, rótulo) aos tokens do doc.
+
+    Um span que já coincide com tokens é mantido; se não coincidir, tenta de novo sem
+    espaços e pontuação nas bordas. Spans que ainda cortam um token são rejeitados.
+    Retorna (spans aceitos, spans rejeitados expandidos aos tokens, status de cada entidade).
+    """
+    text = doc.text
+    spans, rejected, status = [], [], []
+    for start, end, label in entities:
+        span = doc.char_span(start, end, label=label)
+        if span is not None:
+            spans.append(span)
+            status.append("aligned")
+            continue
+        while start < end and not text[start].isalnum():
+            start += 1
+        while end > start and not text[end - 1].isalnum():
+            end -= 1
+        span = doc.char_span(start, end, label=label) if start < end else None
+        if span is not None:
+            spans.append(span)
+            status.append("fixed")
+        else:
+            expanded = doc.char_span(start, end, alignment_mode="expand") if start < end else None
+            if expanded is not None:
+                rejected.append(expanded)
+            status.append("rejected")
+    # Tokens de um span rejeitado ficam sem rótulo (nem entidade nem "O"), exceto se já são de outra entidade
+    rejected = [r for r in rejected if not any(s.start < r.end and r.start < s.end for s in spans)]
+    return spans, rejected, status
@@ -0,0 +1,196 @@
+import atexit
+import json
+import math
+import os
+import sys
+import time
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Instrumentação leve por etapa: tempos, contadores e pico de memória (RSS), exportados
+# em JSON ou no formato texto do Prometheus. Com a variável NER_METRICS_FILE definida,
+# as métricas são gravadas nesse arquivo ao fim do processo.
+METRICS_FILE_ENV = "NER_METRICS_FILE"
+# Durações mais recentes guardadas por timer, de onde saem p50/p99
+LATENCY_SAMPLES = 2048
+QUANTILES = (50, 99)
+
+def peak_rss_bytes():
+    """Pico de memória residente do processo (ru_maxrss é em KB no Linux e em bytes no macOS)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def current_rss_bytes():
+    """Memória residente atual do processo (Linux; None em outros sistemas)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def metric_key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+def format_key(key, prefix=""):
+    name, labels = key
+    if not labels:
+        return prefix + name
+    return prefix + name + "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+class Metrics:
+    """Registro em memória de tempos, contadores e amostras de RSS de um processo."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.started = time.time()
+        # Chave (nome, rótulos) -> [chamadas, segundos, maior duração]
+        self.timers = {}
+        self.samples = {}
+        self.counters = {}
+        self.peak_rss = {}
+        self.last_export = 0.0
+
+    def add_time(self, name, seconds, **labels):
+        key = metric_key(name, labels)
+        timer = self.timers.setdefault(key, [0, 0.0, 0.0])
+        if key not in self.samples:
+            self.samples[key] = deque(maxlen=LATENCY_SAMPLES)
+        self.samples[key].append(seconds)
+        timer[0] += 1
+        timer[1] += seconds
+        if seconds > timer[2]:
+            timer[2] = seconds
+
+    @contextmanager
+    def timer(self, name, rss=False, **labels):
+        """Mede o bloco; com rss=True também amostra o pico de memória ao final (para etapas inteiras)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start, **labels)
+            if rss:
+                self.sample_rss(name)
+
+    def timed_iter(self, name, iterable, **labels):
+        """Repassa os itens medindo só o tempo gasto para produzi-los (não o do consumidor)."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.add_time(name, time.perf_counter() - start, **labels)
+            yield item
+
+    def count(self, name, n=1, **labels):
+        key = metric_key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + n
+
+    def seconds(self, name, **labels):
+        """Tempo total acumulado por um timer (0.0 se nunca rodou)."""
+        return self.timers.get(metric_key(name, labels), [0, 0.0, 0.0])[1]
+
+    def counters_by(self, name, label):
+        """Valor do rótulo `label` -> total dos contadores `name` (ex.: caminhos da cascata)."""
+        totals = {}
+        for (counter_name, labels), value in self.counters.items():
+            labels = dict(labels)
+            if counter_name == name and label in labels:
+                totals[labels[label]] = totals.get(labels[label], 0) + value
+        return totals
+
+    def quantiles(self, name, **labels):
+        """{50: segundos, 99: segundos} das últimas LATENCY_SAMPLES durações do timer (None sem amostras)."""
+        samples = self.samples.get(metric_key(name, labels))
+        if not samples:
+            return None
+        return {q: percentile(samples, q) for q in QUANTILES}
+
+    def sample_rss(self, stage):
+        peak = peak_rss_bytes()
+        if peak is not None:
+            self.peak_rss[stage] = peak
+
+    def to_dict(self):
+        return {
+            "uptime_seconds": round(time.time() - self.started, 3),
+            "timers": {
+                format_key(key): {"count": count, "seconds": round(total, 6), "max_seconds": round(longest, 6),
+                                  **{f"p{q}_seconds": round(percentile(self.samples[key], q), 6) for q in QUANTILES}}
+                for key, (count, total, longest) in sorted(self.timers.items())
+            },
+            "counters": {format_key(key): value for key, value in sorted(self.counters.items())},
+            "peak_rss_bytes": dict(sorted(self.peak_rss.items())),
+        }
+
+    def to_prometheus(self):
+        lines = [f"ner_uptime_seconds {time.time() - self.started:.3f}"]
+        for key, (count, total, longest) in sorted(self.timers.items()):
+            name, labels = key
+            lines.append(f"{format_key((name + '_seconds_total', labels), 'ner_')} {total:.6f}")
+            lines.append(f"{format_key((name + '_calls_total', labels), 'ner_')} {count}")
+            lines.append(f"{format_key((name + '_seconds_max', labels), 'ner_')} {longest:.6f}")
+            for q in QUANTILES:
+                quantile = labels + (("quantile", str(q / 100)),)
+                lines.append(f"{format_key((name + '_seconds', quantile), 'ner_')} {percentile(self.samples[key], q):.6f}")
+        for key, value in sorted(self.counters.items()):
+            name, labels = key
+            lines.append(f"{format_key((name + '_total', labels), 'ner_')} {value}")
+        for stage, peak in sorted(self.peak_rss.items()):
+            lines.append(f'ner_peak_rss_bytes{{stage="{stage}"}} {peak}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Grava as métricas de forma atômica: texto do Prometheus para .prom, JSON nos demais casos."""
+        self.sample_rss("process")
+        content = self.to_prometheus() if path.endswith(".prom") else json.dumps(self.to_dict(), indent=2)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def export(self, path=None, min_interval=0.0):
+        """Grava em `path` (ou em NER_METRICS_FILE), no máximo uma vez a cada `min_interval` segundos."""
+        path = path or os.environ.get(METRICS_FILE_ENV)
+        now = time.monotonic()
+        if not path or now - self.last_export < min_interval:
+            return
+        self.last_export = now
+        self.write(path)
+
+class RateLimitedLog:
+    """Imprime no máximo uma mensagem a cada `interval` segundos, informando quantas foram omitidas."""
+
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self.last = -math.inf
+        self.suppressed = 0
+
+    def __call__(self, message, force=False):
+        now = time.monotonic()
+        if not force and now - self.last < self.interval:
+            self.suppressed += 1
+            return
+        if self.suppressed:
+            message += f" ({self.suppressed} messages suppressed)"
+        print(message, flush=True)
+        self.last = now
+        self.suppressed = 0
+
+METRICS = Metrics()
+atexit.register(METRICS.export)
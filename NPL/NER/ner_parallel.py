@@ -0,0 +1,72 @@
+import argparse
+import importlib.util
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from ner_io import iter_table
+
+# Rotulagem fraca em paralelo: o CSV é lido em pedaços e cada pedaço é rotulado em um processo
+
+def parallel_training_data(chunks, prepare_training_data, workers=None):
+    """Rotula os pedaços (DataFrames) num pool de processos e junta o resultado na ordem original.
+
+    No máximo 2 * workers pedaços ficam em memória ao mesmo tempo. Os workers são criados
+    com fork: prepare_training_data vem de um script carregado com load_script, que só
+    existe no sys.modules deste processo. Sem fork (Windows), a rotulagem é serial.
+    """
+    workers = workers or os.cpu_count()
+    training_data = []
+    if "fork" not in multiprocessing.get_all_start_methods():
+        print("fork start method unavailable, labeling serially")
+        for chunk in chunks:
+            training_data.extend(prepare_training_data(chunk))
+        return training_data
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork")) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(prepare_training_data, chunk))
+            if len(pending) >= 2 * workers:
+                training_data.extend(pending.popleft().result())
+        while pending:
+            training_data.extend(pending.popleft().result())
+    return training_data
+
+def load_script(path):
+    """Importa um script de categoria (os nomes têm hífen) e o registra para uso nos processos filhos."""
+    name = os.path.splitext(os.path.basename(path))[0].strip().replace("-", "_")
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def benchmark(script_path, csv_path, worker_counts, chunksize):
+    """Mede linhas/s da rotulagem para cada número de processos."""
+    module = load_script(script_path)
+    rows = sum(len(chunk) for chunk in iter_table(csv_path, chunksize))
+    baseline = None
+    reference = None
+    for workers in worker_counts:
+        start = time.perf_counter()
+        training_data = parallel_training_data(iter_table(csv_path, chunksize), module.prepare_training_data, workers)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        reference = reference or training_data
+        same = "yes" if training_data == reference else "NO"
+        print(f"workers={workers:2d}  {elapsed:7.2f}s  {rows / elapsed:10.0f} rows/s  "
+              f"speedup={baseline / elapsed:5.2f}x  same_output={same}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da rotulagem fraca em paralelo")
+    parser.add_argument("script", help="script da categoria, ex.: smarthpone-title-split.py")
+    parser.add_argument("csv", help="CSV de treino da categoria")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--chunksize", type=int, default=50000)
+    args = parser.parse_args()
+    benchmark(args.script, args.csv, args.workers, args.chunksize)
+
+if __name__ == "__main__":
+    main()
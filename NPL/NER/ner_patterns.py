@@ -0,0 +1,62 @@
+import re
+from functools import lru_cache
+
+# Padrões compilados uma única vez e compartilhados por todos os rotuladores
+DIGITS = re.compile(r'\d+')
+
+RAM = re.compile(r'\b(\d+\s*GB RAM|\d+\s*G RAM|\d+\s*GB|\d+\s*RAM)\b', re.IGNORECASE)
+STORAGE = re.compile(r'\b(\d+\s*GB|\d+\s*TB)\b', re.IGNORECASE)
+# RAM sem "GB" explícito (ex.: "4G", "8 RAM"), usado quando RAM não aparece no formato comum
+RAM_LOOSE = re.compile(r'\b\d+\s*(?:RAM|G)\b', re.IGNORECASE)
+
+NOTEBOOK_RAM = re.compile(r'\b(\d+\s*GB RAM|\d+\s*G RAM|\d+\s*GB)\b', re.IGNORECASE)
+SSD = re.compile(r'\b(\d+\s*GB SSD|\d+\s*TB SSD)\b', re.IGNORECASE)
+CPU = re.compile(r'\b(Intel Core [^\s]+|AMD Ryzen [^\s]+)\b', re.IGNORECASE)
+GPU = re.compile(
+    r'\b(GTX \d+\s*(?:Ti|Super)?|RTX \d+\s*(?:Ti|Super)?|Radeon\s*\w+\s*\d*\w*|NVIDIA\s*\w+\s*\d*\w*'
+    r'|Intel\s*(?:Iris\s*Xe|UHD|HD\s*Graphics)|\bAMD\s*\w+\s*\d*\w*|GT\d+\s*|MX\d+\s*)\b',
+    re.IGNORECASE,
+)
+
+# Polegadas sem o valor do CSV: qualquer número de dois dígitos
+SIZE = re.compile(r'\b\d{2}\b')
+
+# RESOLUTION e TECHNOLOGY das TVs vêm dos valores do CSV (ver literal_pattern)
+CATEGORY_PATTERNS = {
+    'celulares': {'RAM': RAM, 'STORAGE': STORAGE},
+    'tablets': {'RAM': RAM, 'STORAGE': STORAGE},
+    'notebooks': {'CPU': CPU, 'GPU': GPU, 'RAM': NOTEBOOK_RAM, 'SSD': SSD},
+    'tvs': {'SIZE': SIZE},
+    'smartwatches': {},
+}
+
+@lru_cache(maxsize=100000)
+def compile_pattern(pattern):
+    """Compila (uma vez por padrão) uma regex case insensitive."""
+    return re.compile(pattern, re.IGNORECASE)
+
+def literal_pattern(value):
+    """Padrão compilado que casa o valor literal do CSV (modelo, RAM, resolução...)."""
+    return compile_pattern(re.escape(value))
+
+def size_pattern(inches):
+    """Padrão compilado para o tamanho em polegadas informado no CSV."""
+    return compile_pattern(rf'\b{inches}\b[\s"]?(?:polegadas|")?')
+
+def leading_number(value):
+    """Primeiro número inteiro do texto (ex.: "128 GB" -> 128)."""
+    return int(DIGITS.search(value).group())
+
+def match_category(category, text):
+    """Roda o título por todos os padrões da categoria e retorna {rótulo: valores encontrados}."""
+    return {label: pattern.findall(text) for label, pattern in CATEGORY_PATTERNS[category].items()}
+
+def find_entity(entity_type, pattern, text, existing_entities):
+    """Primeira ocorrência do padrão que não sobrepõe as entidades já encontradas."""
+    if isinstance(pattern, str):
+        pattern = compile_pattern(pattern)
+    for m in pattern.finditer(text):
+        start, end = m.start(), m.end()
+        if not any(e_start < end and start < e_end for e_start, e_end, _ in existing_entities):
+            return (start, end, entity_type)
+    return None
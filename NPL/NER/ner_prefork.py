@@ -0,0 +1,280 @@
+import argparse
+import gc
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+# Runner no estilo fork-server: o processo pai importa pandas/spaCy e carrega os modelos
+# uma única vez; os workers são criados com fork e compartilham os pesos por copy-on-write.
+# Os imports pesados ficam dentro das funções, então `--help` e `submit` continuam rápidos.
+#
+#   python ner_prefork.py serve --workers 4
+#   python ner_prefork.py submit feed.csv out.csv --category-column category
+#   python ner_prefork.py stats
+#   python ner_prefork.py run jobs.json --workers 4     (sem servidor: carrega, processa e sai)
+
+SOCKET_PATH = "/tmp/ner_prefork.sock"
+
+def memory_breakdown(pid="self"):
+    """RSS, PSS e memória privada/compartilhada (bytes) de um processo, via /proc (Linux).
+
+    Nos workers, `private` é o que o fork realmente copiou; o resto continua compartilhado com o pai.
+    """
+    fields = {"Rss": "rss", "Pss": "pss", "Private_Clean": "private", "Private_Dirty": "private",
+              "Shared_Clean": "shared", "Shared_Dirty": "shared"}
+    memory = {"rss": 0, "pss": 0, "private": 0, "shared": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in fields:
+                    memory[fields[name]] += int(value.split()[0]) * 1024
+    except OSError:
+        return None
+    return memory
+
+def load_router(categories, joint=None, batch_size=256):
+    """Importa o pipeline e carrega os modelos no processo pai; retorna o router e os tempos."""
+    start = time.perf_counter()
+    from ner_router import CATEGORY_MODELS, ModelRouter, joint_category_models
+    imported = time.perf_counter()
+    category_models = joint_category_models(joint) if joint else CATEGORY_MODELS
+    router = ModelRouter(category_models=category_models, batch_size=batch_size)
+    for category in categories:
+        router.get_model(category)
+    loaded = time.perf_counter()
+    # Objetos carregados saem do alcance do coletor de lixo, que senão tocaria
+    # em todos eles nos workers e forçaria a cópia das páginas
+    gc.freeze()
+    return router, {"import_seconds": round(imported - start, 3), "load_seconds": round(loaded - imported, 3)}
+
+def run_job(router, job):
+    """Um job: {"csv", "output", "category" ou "category_column", "title_column", "chunksize"}."""
+    from ner_router import route_csv
+    start = time.perf_counter()
+    rows = route_csv(router, job["csv"], job["output"], job.get("category_column", "category"),
+                     job.get("title_column", "title"), job.get("chunksize", 10000), job.get("category"))
+    return {"rows": rows, "seconds": round(time.perf_counter() - start, 3), "pid": os.getpid()}
+
+def worker_loop(router, tasks, results):
+    while True:
+        item = tasks.get()
+        if item is None:
+            break
+        job_id, job = item
+        # Avisa o pai de quem pegou o job, para que ele falhe o job se este worker morrer
+        results.put((job_id, {"started": os.getpid()}))
+        try:
+            result = {"ok": True, **run_job(router, job)}
+        except Exception as e:
+            result = {"ok": False, "error": repr(e), "pid": os.getpid()}
+        results.put((job_id, result))
+
+class PreforkPool:
+    """Workers criados com fork depois que os modelos já estão na memória do pai.
+
+    Um worker que morre (OOM, sinal, crash do spaCy) é substituído por um novo fork e os
+    jobs que ele estava processando terminam com erro em vez de ficarem esperando.
+    """
+
+    def __init__(self, router, workers, poll_seconds=1.0):
+        self.router = router
+        self.context = multiprocessing.get_context("fork")
+        self.tasks = self.context.Queue()
+        self.results = self.context.Queue()
+        self.poll_seconds = poll_seconds
+        # Job -> pid do worker que o está processando
+        self.running = {}
+        start = time.perf_counter()
+        self.processes = [self.spawn() for _ in range(workers)]
+        self.fork_seconds = round(time.perf_counter() - start, 3)
+
+    def spawn(self):
+        process = self.context.Process(target=worker_loop, args=(self.router, self.tasks, self.results), daemon=True)
+        process.start()
+        return process
+
+    def reap(self):
+        """Substitui os workers mortos e devolve (job, erro) dos jobs que estavam com eles."""
+        failed = []
+        for index, process in enumerate(self.processes):
+            if process.is_alive():
+                continue
+            print(f"Worker {process.pid} died (exit code {process.exitcode}), starting a new one", flush=True)
+            for job_id in [job_id for job_id, pid in self.running.items() if pid == process.pid]:
+                del self.running[job_id]
+                failed.append((job_id, {"ok": False, "error": f"worker {process.pid} died (exit code {process.exitcode})",
+                                        "pid": process.pid}))
+            self.processes[index] = self.spawn()
+        return failed
+
+    def completed(self):
+        """(job, resultado) de cada job terminado, para sempre; a cada poll_seconds sem resultado, confere os workers."""
+        while True:
+            try:
+                job_id, result = self.results.get(timeout=self.poll_seconds)
+            except queue.Empty:
+                yield from self.reap()
+                continue
+            if "started" in result:
+                self.running[job_id] = result["started"]
+                continue
+            self.running.pop(job_id, None)
+            yield job_id, result
+
+    def map(self, jobs):
+        """Processa os jobs nos workers e retorna os resultados na ordem dos jobs."""
+        for job_id, job in enumerate(jobs):
+            self.tasks.put((job_id, job))
+        results = {}
+        completed = self.completed()
+        while len(results) < len(jobs):
+            job_id, result = next(completed)
+            results[job_id] = result
+        return [results[job_id] for job_id in range(len(jobs))]
+
+    def memory(self):
+        return {"parent": memory_breakdown(),
+                "workers": {process.pid: memory_breakdown(process.pid) for process in self.processes}}
+
+    def close(self):
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join()
+
+def serve(pool, socket_path):
+    """Atende jobs (uma linha JSON por requisição) num socket Unix até ser interrompido."""
+    waiting = {}
+    job_ids = itertools.count()
+
+    def dispatch():
+        # Entrega cada resultado à conexão que está esperando por ele
+        for job_id, result in pool.completed():
+            event, slot = waiting.pop(job_id)
+            slot.append(result)
+            event.set()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                request = json.loads(line)
+                if request.get("command") == "stats":
+                    reply = {"ok": True, "memory": pool.memory()}
+                else:
+                    job_id, event, slot = next(job_ids), threading.Event(), []
+                    waiting[job_id] = (event, slot)
+                    pool.tasks.put((job_id, request))
+                    event.wait()
+                    reply = slot[0]
+                self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+
+    threading.Thread(target=dispatch, daemon=True).start()
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    with socketserver.ThreadingUnixStreamServer(socket_path, Handler) as server:
+        server.daemon_threads = True
+        print(f"Listening on {socket_path}", flush=True)
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(socket_path)
+
+def request(socket_path, payload):
+    """Cliente leve: só stdlib, sem importar pandas nem spaCy."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall((json.dumps(payload) + "\n").encode("utf-8"))
+        with client.makefile("rb") as reply:
+            return json.loads(reply.readline())
+
+def format_memory(memory):
+    if memory is None:
+        return "n/a"
+    return " ".join(f"{name}={value / 2 ** 20:.1f}MB" for name, value in memory.items())
+
+def print_startup(timings, pool):
+    print(f"Startup: import {timings['import_seconds']:.2f}s, load {timings['load_seconds']:.2f}s, "
+          f"fork {pool.fork_seconds:.2f}s")
+    memory = pool.memory()
+    print(f"  parent     {format_memory(memory['parent'])}")
+    for pid, worker_memory in memory["workers"].items():
+        print(f"  worker {pid:<6} {format_memory(worker_memory)}")
+
+def add_job_arguments(parser):
+    parser.add_argument("--categories", nargs="+", default=["celulares", "notebooks", "smartwatches", "tablets", "tvs"],
+                        help="modelos carregados no pai")
+    parser.add_argument("--joint", help="diretório de um modelo conjunto (ner_joint.py) para todas as categorias")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=256)
+
+def main():
+    parser = argparse.ArgumentParser(description="Workers pré-criados com fork que compartilham os modelos carregados")
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="carrega os modelos, cria os workers e atende jobs no socket")
+    add_job_arguments(serve_parser)
+
+    run_parser = commands.add_parser("run", help="processa uma lista de jobs (JSON) e sai")
+    run_parser.add_argument("jobs", help="arquivo JSON com a lista de jobs")
+    add_job_arguments(run_parser)
+
+    submit_parser = commands.add_parser("submit", help="envia um job para o servidor")
+    submit_parser.add_argument("csv")
+    submit_parser.add_argument("output")
+    submit_parser.add_argument("--category", help="todas as linhas são desta categoria")
+    submit_parser.add_argument("--category-column", default="category")
+    submit_parser.add_argument("--title-column", default="title")
+    submit_parser.add_argument("--chunksize", type=int, default=10000)
+
+    commands.add_parser("stats", help="memória do pai e de cada worker do servidor")
+    args = parser.parse_args()
+
+    if args.command == "submit":
+        job = {"csv": os.path.abspath(args.csv), "output": os.path.abspath(args.output), "category": args.category,
+               "category_column": args.category_column, "title_column": args.title_column, "chunksize": args.chunksize}
+        result = request(args.socket, job)
+        print(json.dumps(result))
+        sys.exit(0 if result["ok"] else 1)
+    if args.command == "stats":
+        memory = request(args.socket, {"command": "stats"})["memory"]
+        print(f"parent     {format_memory(memory['parent'])}")
+        for pid, worker_memory in memory["workers"].items():
+            print(f"worker {pid:<6} {format_memory(worker_memory)}")
+        return
+
+    router, timings = load_router(args.categories, args.joint, args.batch_size)
+    pool = PreforkPool(router, args.workers)
+    print_startup(timings, pool)
+    if args.command == "serve":
+        try:
+            serve(pool, args.socket)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    with open(args.jobs, encoding="utf-8") as f:
+        jobs = json.load(f)
+    start = time.perf_counter()
+    results = pool.map(jobs)
+    for job, result in zip(jobs, results):
+        status = f"{result['rows']} rows in {result['seconds']:.2f}s (pid {result['pid']})" if result["ok"] else result["error"]
+        print(f"{job['csv']}: {status}")
+    print(f"{len(jobs)} jobs in {time.perf_counter() - start:.2f}s")
+    memory = pool.memory()
+    for pid, worker_memory in memory["workers"].items():
+        print(f"  worker {pid:<6} {format_memory(worker_memory)}")
+    pool.close()
+    if not all(result["ok"] for result in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
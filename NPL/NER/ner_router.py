@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+import time
+import pandas as pd
+from ner_inference import apply_regex_fallbacks, extract_entities_stream, load_model
+from ner_io import TableWriter, iter_table
+from ner_metrics import METRICS
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(MODULE_DIR, "trained_models")
+
+# Categoria -> diretório do modelo em trained_models/
+CATEGORY_MODELS = {
+    "celulares": "modelo_ner_celulares",
+    "notebooks": "modelo_ner_notebooks",
+    "smartwatches": "modelo_ner_smartwatches",
+    "tablets": "modelo_ner_tablets",
+    "tvs": "modelo_ner_tvs",
+}
+
+# Categorias cujos modelos têm RAM/STORAGE e usam o fallback de regex
+REGEX_FALLBACK_CATEGORIES = {"celulares", "tablets"}
+
+# Rótulos de cada categoria; um modelo conjunto (ner_joint.py) pode prever rótulos de outras categorias
+CATEGORY_LABELS = {
+    "celulares": {"MODEL", "RAM", "STORAGE"},
+    "notebooks": {"CPU", "GPU", "MODEL", "RAM", "SSD"},
+    "smartwatches": {"BRAND", "MODEL"},
+    "tablets": {"MODEL", "RAM", "STORAGE"},
+    "tvs": {"MODEL", "RESOLUTION", "SIZE", "TECHNOLOGY"},
+}
+
+def joint_category_models(model_dir, categories=CATEGORY_MODELS):
+    """Todas as categorias atendidas por um único modelo conjunto."""
+    return {category: os.path.abspath(model_dir) for category in categories}
+
+class ModelRouter:
+    """Atende todas as categorias em um único processo.
+
+    Os modelos são carregados no primeiro uso e, com idle_seconds, descarregados
+    quando ficam esse tempo sem receber títulos. Em route, um título de categoria
+    desconhecida sai com entidades vazias (contado em `unknown_category`), a não ser
+    com strict=True, que interrompe com ValueError.
+    """
+
+    def __init__(self, models_dir=MODELS_DIR, category_models=CATEGORY_MODELS, batch_size=256,
+                 n_process=1, idle_seconds=None, max_pending=10000, strict=False):
+        self.models_dir = models_dir
+        self.category_models = category_models
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self.idle_seconds = idle_seconds
+        self.max_pending = max_pending
+        self.strict = strict
+        self.models = {}
+        self.last_used = {}
+        # Diretório -> modelo carregado, para categorias que compartilham o mesmo modelo
+        self.loaded = {}
+
+    def get_model(self, category):
+        """Modelo da categoria, carregado sob demanda."""
+        if category not in self.category_models:
+            raise ValueError(f"Unknown category: {category}")
+        self.evict_idle(keep=category)
+        if category not in self.models:
+            model_dir = os.path.join(self.models_dir, self.category_models[category])
+            if model_dir not in self.loaded:
+                with METRICS.timer("model_load", rss=True, category=category):
+                    self.loaded[model_dir] = load_model(model_dir)
+            self.models[category] = self.loaded[model_dir]
+        self.last_used[category] = time.monotonic()
+        return self.models[category]
+
+    def evict_idle(self, keep=None):
+        """Descarrega os modelos sem uso há mais de idle_seconds (exceto `keep`)."""
+        if self.idle_seconds is None:
+            return
+        now = time.monotonic()
+        for category in list(self.models):
+            if category != keep and now - self.last_used[category] > self.idle_seconds:
+                self.evict(category)
+
+    def evict(self, category):
+        nlp = self.models.pop(category, None)
+        self.last_used.pop(category, None)
+        # O modelo só sai da memória quando nenhuma categoria o usa mais
+        if nlp is not None and all(other is not nlp for other in self.models.values()):
+            self.loaded = {path: model for path, model in self.loaded.items() if model is not nlp}
+
+    def run_batch(self, category, titles):
+        """Roda um lote de títulos de uma categoria no modelo correspondente."""
+        nlp = self.get_model(category)
+        METRICS.count("routed_titles", len(titles), category=category)
+        results = list(extract_entities_stream(nlp, titles, batch_size=self.batch_size, n_process=self.n_process))
+        labels = CATEGORY_LABELS.get(category)
+        if labels is not None:
+            results = [{label: text for label, text in entities.items() if label in labels} for entities in results]
+        if category in REGEX_FALLBACK_CATEGORIES:
+            results = [apply_regex_fallbacks(title if isinstance(title, str) else "", entities)
+                       for title, entities in zip(titles, results)]
+        return results
+
+    def route(self, pairs):
+        """Recebe pares (categoria, título) misturados e devolve (categoria, título, entidades) na ordem de entrada.
+
+        Os títulos são agrupados em lotes por categoria; um lote roda quando enche ou quando
+        há títulos demais esperando pelo resultado de uma categoria menos frequente.
+        """
+        buffers = {}
+        results = {}
+        # Índice -> (categoria, título) dos pares ainda não devolvidos
+        waiting = {}
+        next_index = 0
+
+        def flush(category):
+            indexes, titles = zip(*buffers.pop(category))
+            for index, entities in zip(indexes, self.run_batch(category, list(titles))):
+                results[index] = entities
+
+        for index, (category, title) in enumerate(pairs):
+            waiting[index] = (category, title)
+            if category not in self.category_models:
+                if self.strict:
+                    raise ValueError(f"Unknown category: {category}")
+                METRICS.count("unknown_category", category=str(category))
+                results[index] = {}
+            else:
+                buffers.setdefault(category, []).append((index, title))
+                if len(buffers[category]) >= self.batch_size:
+                    flush(category)
+            if len(waiting) > self.max_pending and next_index not in results:
+                # Libera a fila: roda o lote da categoria que segura o título mais antigo
+                flush(waiting[next_index][0])
+
+            while next_index in results:
+                yield (*waiting.pop(next_index), results.pop(next_index))
+                next_index += 1
+
+        for category in list(buffers):
+            flush(category)
+        while next_index in results:
+            yield (*waiting.pop(next_index), results.pop(next_index))
+            next_index += 1
+
+def route_csv(router, csv_path, output_path, category_column="category", title_column="title", chunksize=10000,
+              category=None):
+    """Extrai as entidades de um CSV misto (ou de uma única `category`) e grava categoria, título e entidades em JSON.
+
+    Entrada e saída podem ser CSV ou Parquet (pela extensão, ver ner_io.py); só as colunas
+    de categoria e título são lidas. Retorna o número de linhas gravadas.
+    """
+    columns = [title_column] if category else [category_column, title_column]
+
+    def pairs():
+        for chunk in iter_table(csv_path, chunksize, columns):
+            categories = [category] * len(chunk) if category else chunk[category_column]
+            yield from zip(categories, chunk[title_column])
+
+    def frame(rows):
+        return pd.DataFrame(rows, columns=["category", "title", "entities"])
+
+    rows = []
+    total = 0
+    with TableWriter(output_path) as writer:
+        for row_category, title, entities in router.route(pairs()):
+            rows.append({"category": row_category, "title": title, "entities": json.dumps(entities, ensure_ascii=False)})
+            if len(rows) == chunksize:
+                writer.write(frame(rows))
+                total += len(rows)
+                rows = []
+        if rows or total == 0:
+            writer.write(frame(rows))
+            total += len(rows)
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Extrai entidades de um CSV com títulos de várias categorias")
+    parser.add_argument("csv", help="CSV de entrada com as colunas de categoria e título")
+    parser.add_argument("output", help="CSV de saída (categoria, título, entidades em JSON)")
+    parser.add_argument("--category-column", default="category")
+    parser.add_argument("--title-column", default="title")
+    parser.add_argument("--chunksize", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--idle-seconds", type=float, default=None)
+    parser.add_argument("--joint", help="diretório de um modelo conjunto (ner_joint.py) para todas as categorias")
+    parser.add_argument("--strict", action="store_true", help="interrompe em uma categoria desconhecida")
+    args = parser.parse_args()
+
+    category_models = joint_category_models(args.joint) if args.joint else CATEGORY_MODELS
+    router = ModelRouter(category_models=category_models, batch_size=args.batch_size, idle_seconds=args.idle_seconds,
+                         strict=args.strict)
+    route_csv(router, args.csv, args.output, args.category_column, args.title_column, args.chunksize)
+
+if __name__ == "__main__":
+    main()
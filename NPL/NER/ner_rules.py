@@ -0,0 +1,92 @@
+import re
+from ner_io import read_table
+
+# Etapa de regras da cascata: resolve com regex os campos que aparecem de forma inequívoca
+# no título; o modelo só roda para os títulos em que algum campo ficou sem resposta.
+# RAM e armazenamento saem no mesmo formato dos fallbacks de regex do modelo ("8 GB").
+
+# RAM com a palavra RAM explícita (ex.: "8GB RAM", "8 GB de RAM")
+CONFIDENT_RAM = re.compile(r'\b(\d+)\s*GB\s*(?:de\s*)?RAM\b', re.IGNORECASE)
+# GB/TB que não são seguidos de RAM
+CONFIDENT_STORAGE = re.compile(r'\b(\d+)\s*(GB|TB)\b(?!\s*(?:de\s*)?RAM\b)', re.IGNORECASE)
+# Palavras e sinais soltos: a unidade da busca de modelos conhecidos
+TOKEN = re.compile(r'\w+|[^\w\s]')
+
+def unique_match(values):
+    """O único valor distinto (ignorando caixa e espaços) ou None se houver zero ou mais de um."""
+    distinct = {}
+    for value in values:
+        distinct.setdefault(re.sub(r'\s+', '', value).casefold(), value)
+    return next(iter(distinct.values())) if len(distinct) == 1 else None
+
+def load_known_models(csv_path, column='modelo'):
+    """Modelos conhecidos a partir de uma coluna de CSV (ex.: a coluna de modelo dos dados de treino).
+
+    Valores só com dígitos ou com menos de 3 caracteres são descartados por serem ambíguos.
+    """
+    values = read_table(csv_path, columns=[column])[column].dropna().astype(str).str.strip()
+    return sorted({value for value in values if len(value) >= 3 and not value.isdigit()})
+
+class ModelIndex:
+    """Modelos conhecidos indexados pela sequência de tokens (minúsculos).
+
+    A busca consulta um dicionário para cada posição do título e cada número de tokens
+    que algum modelo tem, então o custo depende do tamanho do título e não do catálogo.
+    """
+
+    def __init__(self, models):
+        self.models = {}
+        for model in models:
+            tokens = tuple(token.casefold() for token in TOKEN.findall(model))
+            if tokens:
+                self.models.setdefault(tokens, model)
+        # Mais longos primeiro: na mesma posição, "Galaxy A54 5G" ganha de "Galaxy A54"
+        self.lengths = sorted({len(tokens) for tokens in self.models}, reverse=True)
+
+    def find(self, text):
+        """Trechos de `text` com um modelo conhecido, da esquerda para a direita e sem sobreposição."""
+        spans = [(match.start(), match.end()) for match in TOKEN.finditer(text)]
+        tokens = [text[start:end].casefold() for start, end in spans]
+        found = []
+        i = 0
+        while i < len(tokens):
+            for length in self.lengths:
+                if i + length <= len(tokens) and tuple(tokens[i:i + length]) in self.models:
+                    found.append(text[spans[i][0]:spans[i + length - 1][1]])
+                    i += length
+                    break
+            else:
+                i += 1
+        return found
+
+class RuleStage:
+    """Resolve MODEL, RAM e STORAGE por regras quando o título não deixa dúvida.
+
+    Um campo só é marcado como resolvido quando há exatamente um valor candidato;
+    com zero ou vários candidatos a decisão fica para o modelo.
+    """
+
+    def __init__(self, known_models=(), required=('MODEL', 'RAM', 'STORAGE')):
+        self.model_index = ModelIndex(known_models) if known_models else None
+        self.required = tuple(required)
+
+    def resolve(self, title):
+        """{rótulo: texto} dos campos resolvidos com confiança."""
+        confident = {}
+        ram = unique_match(f"{int(m.group(1))} GB" for m in CONFIDENT_RAM.finditer(title))
+        if ram:
+            confident['RAM'] = ram
+        storage = unique_match(f"{int(m.group(1))} {m.group(2).upper()}"
+                               for m in CONFIDENT_STORAGE.finditer(title)
+                               if m.group(2).upper() == 'TB' or int(m.group(1)) >= 16)
+        if storage:
+            confident['STORAGE'] = storage
+        if self.model_index is not None:
+            model = unique_match(self.model_index.find(title))
+            if model:
+                confident['MODEL'] = model
+        return confident
+
+    def covers(self, confident):
+        """Se as regras resolveram todos os campos necessários (e o modelo pode ser pulado)."""
+        return all(label in confident for label in self.required)
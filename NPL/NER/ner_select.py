@@ -0,0 +1,149 @@
+import argparse
+import random
+import time
+import pandas as pd
+import spacy
+from spacy.tokens import Doc
+from ner_cache import normalize_title
+from ner_engine import load_category_data, load_configs, resolve_path
+from ner_io import TableWriter
+from ner_metrics import METRICS
+from ner_parallel import load_script
+from ner_training import make_examples
+
+# Seleção de amostras para o retreino: o modelo atual processa um CSV candidato e os títulos
+# são ordenados pela discordância entre a previsão e os rótulos fracos do rotulador da
+# categoria e/ou pela incerteza do beam. Só os mais informativos (mais uma pequena amostra
+# aleatória do resto, para o modelo não esquecer os casos fáceis) vão para o CSV de saída.
+#
+#   python ner_select.py tablets candidatos.csv --model trained_models/modelo_ner_tablets --output selecionados.csv
+
+STRATEGIES = ("disagreement", "confidence", "combined")
+
+def match_rows(titles, texts):
+    """Posição em `titles` de cada texto de `texts`, que é `titles` sem alguns itens e na mesma ordem.
+
+    O rotulador descarta os títulos sem entidades e make_examples os que ficam sem entidades
+    depois do alinhamento; os restantes mantêm a ordem do CSV. Os títulos precisam ser
+    únicos: com repetições, um texto poderia ser casado com a linha errada.
+    """
+    rows, position = [], 0
+    for row, title in enumerate(titles):
+        if position < len(texts) and texts[position] == str(title):
+            rows.append(row)
+            position += 1
+    if position != len(texts):
+        raise ValueError("Could not match labeled titles back to the CSV rows")
+    return rows
+
+def mean(values):
+    return sum(values) / len(values) if values else 0.0
+
+def score_examples(nlp, examples, beam_width=8, batch_size=256):
+    """(discordância, incerteza) de cada Example, as duas entre 0 e 1.
+
+    discordância = 1 - F1 entre as entidades do beam (probabilidade >= 0.5) e os rótulos fracos;
+    incerteza = 2 * min(p, 1 - p) da entidade mais indecisa do beam (0 = modelo seguro).
+    Tokens sem rótulo (spans rejeitados no alinhamento) não contam como discordância.
+    """
+    ner = nlp.get_pipe("ner")
+    before_ner = [proc for _, proc in nlp.pipeline[:nlp.pipe_names.index("ner")]]
+    scores = []
+    for start in range(0, len(examples), batch_size):
+        references = [eg.reference for eg in examples[start:start + batch_size]]
+        docs = [Doc(nlp.vocab, words=[t.text for t in ref], spaces=[bool(t.whitespace_) for t in ref])
+                for ref in references]
+        for proc in before_ner:
+            docs = list(proc.pipe(docs))
+        with METRICS.timer("beam_parse"):
+            beams = ner.beam_parse(docs, beam_width=beam_width)
+        for reference, entity_probs in zip(references, ner.scored_ents(beams)):
+            missing = {token.i for token in reference if token.ent_iob_ == ""}
+            predicted = {span for span, prob in entity_probs.items()
+                         if prob >= 0.5 and not missing.intersection(range(span[0], span[1]))}
+            gold = {(ent.start, ent.end, ent.label_) for ent in reference.ents}
+            f_score = 2 * len(predicted & gold) / (len(predicted) + len(gold)) if predicted or gold else 1.0
+            uncertainty = 2 * max((min(prob, 1 - prob) for prob in entity_probs.values()), default=0.0)
+            scores.append((1 - f_score, uncertainty))
+    return scores
+
+def rank_value(disagreement, uncertainty, strategy):
+    if strategy == "disagreement":
+        return (disagreement, uncertainty)
+    if strategy == "confidence":
+        return (uncertainty, disagreement)
+    return (disagreement + uncertainty,)
+
+def select_indices(scores, n, strategy="combined", random_fraction=0.1, seed=0):
+    """Os n índices escolhidos: os de maior pontuação e uma fração aleatória do resto."""
+    ranked = sorted(range(len(scores)), key=lambda i: rank_value(*scores[i], strategy), reverse=True)
+    n = min(n, len(ranked))
+    n_top = n - int(n * random_fraction)
+    rest = ranked[n_top:]
+    return ranked[:n_top] + random.Random(seed).sample(rest, n - n_top)
+
+def select_training_rows(category, config, csv_path, model_dir, output_path, fraction=0.1, top=None,
+                         strategy="combined", random_fraction=0.1, beam_width=8, batch_size=256):
+    """Grava em `output_path` as linhas escolhidas do CSV candidato, com as pontuações, e retorna um resumo."""
+    start = time.perf_counter()
+    module = load_script(resolve_path(config["script"]))
+    nlp = spacy.load(model_dir)
+    df = load_category_data(config, csv_path)
+    # Uma linha por título normalizado (como em ner_incremental): repetições não trazem
+    # informação nova para o retreino e deixariam ambíguo o caminho de volta às linhas
+    keys = [normalize_title(title) for title in df[config["title_column"]]]
+    df = df[~pd.Series(keys, index=df.index).duplicated()]
+    training_data = module.prepare_training_data(df.copy())
+    examples = make_examples(nlp, training_data, category)
+    texts = [text for text, _ in training_data]
+    labeled_rows = match_rows(df[config["title_column"]], texts)
+    rows = [labeled_rows[i] for i in match_rows(texts, [eg.reference.text for eg in examples])]
+
+    scores = score_examples(nlp, examples, beam_width, batch_size)
+    n = top if top is not None else max(1, round(len(examples) * fraction))
+    chosen = select_indices(scores, n, strategy, random_fraction)
+
+    selected = df.iloc[[rows[i] for i in chosen]].copy()
+    selected["disagreement"] = [round(scores[i][0], 4) for i in chosen]
+    selected["uncertainty"] = [round(scores[i][1], 4) for i in chosen]
+    # Volta aos nomes de coluna do CSV original para que o subconjunto sirva direto de entrada do treino
+    selected = selected.rename(columns={expected: source for source, expected in (config.get("columns") or {}).items()})
+    with TableWriter(output_path) as writer:
+        writer.write(selected)
+
+    summary = {
+        "rows": len(keys), "unique": len(df), "labeled": len(examples), "selected": len(chosen),
+        "disagreement_all": round(mean([d for d, _ in scores]), 4),
+        "disagreement_selected": round(mean([scores[i][0] for i in chosen]), 4),
+        "uncertainty_all": round(mean([u for _, u in scores]), 4),
+        "uncertainty_selected": round(mean([scores[i][1] for i in chosen]), 4),
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+    print(f"{category}: {summary['selected']} of {summary['labeled']} labeled titles selected "
+          f"({summary['selected'] / max(1, summary['labeled']):.0%}) in {summary['seconds']:.2f}s")
+    print(f"  disagreement {summary['disagreement_all']:.3f} -> {summary['disagreement_selected']:.3f}, "
+          f"uncertainty {summary['uncertainty_all']:.3f} -> {summary['uncertainty_selected']:.3f}")
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Escolhe os títulos mais informativos de um CSV candidato para o retreino")
+    parser.add_argument("category")
+    parser.add_argument("csv", help="CSV (ou Parquet) candidato, com as colunas do rotulador da categoria")
+    parser.add_argument("--model", required=True, help="modelo atual")
+    parser.add_argument("--output", required=True, help="CSV (ou Parquet) com as linhas escolhidas")
+    parser.add_argument("--config", help="JSON com configurações por categoria (ver ner_engine.py)")
+    parser.add_argument("--fraction", type=float, default=0.1, help="fração dos títulos rotulados a manter")
+    parser.add_argument("--top", type=int, help="número de títulos a manter (em vez de --fraction)")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="combined")
+    parser.add_argument("--random-fraction", type=float, default=0.1,
+                        help="parte da seleção sorteada entre os títulos restantes")
+    parser.add_argument("--beam-width", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    config = load_configs(args.config)[args.category]
+    select_training_rows(args.category, config, args.csv, args.model, args.output, args.fraction, args.top,
+                         args.strategy, args.random_fraction, args.beam_width, args.batch_size)
+
+if __name__ == "__main__":
+    main()
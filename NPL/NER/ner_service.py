@@ -0,0 +1,234 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from ner_inference import to_result_row
+from ner_metrics import METRICS
+from ner_router import CATEGORY_MODELS, ModelRouter, joint_category_models
+
+# Serviço HTTP local: os modelos são carregados uma vez e os títulos de requisições
+# simultâneas são agrupados em micro-lotes de nlp.pipe por categoria.
+#
+#   POST /extract  {"category": "celulares", "titles": ["...", "..."]}  (ou "title": "...")
+#   GET  /health
+#   GET  /metrics  (texto do Prometheus)
+
+DEFAULT_CATEGORY = "celulares"
+MAX_BODY_BYTES = 10 * 1024 * 1024
+# Rotas com timer próprio; qualquer outro caminho é medido como "other"
+ROUTES = ("/extract", "/health", "/metrics")
+
+class MicroBatcher:
+    """Junta títulos de várias requisições de uma categoria em um único lote do modelo.
+
+    Um lote sai quando chega a max_batch_size títulos ou quando o título mais antigo
+    já esperou max_wait_ms. O modelo roda numa thread própria para não travar o loop.
+    """
+
+    def __init__(self, router, category, max_batch_size=64, max_wait_ms=2.0):
+        self.router = router
+        self.category = category
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"ner-{category}")
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def submit(self, titles):
+        """Entidades de cada título, na ordem recebida."""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for title in titles:
+            future = loop.create_future()
+            self.queue.put_nowait((title, future))
+            futures.append(future)
+        return await asyncio.gather(*futures)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                # Pega o que já chegou sem esperar; só dorme até o prazo se a fila estiver vazia
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            titles = [title for title, _ in batch]
+            METRICS.count("service_batches", category=self.category)
+            METRICS.count("service_titles", len(titles), category=self.category)
+            try:
+                results = await loop.run_in_executor(self.executor, self.router.run_batch, self.category, titles)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), entities in zip(batch, results):
+                if not future.done():
+                    future.set_result(entities)
+
+class NERService:
+    def __init__(self, router, max_batch_size=64, max_wait_ms=2.0):
+        self.router = router
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.batchers = {}
+
+    def batcher(self, category):
+        if category not in self.batchers:
+            self.batchers[category] = MicroBatcher(self.router, category, self.max_batch_size, self.max_wait_ms)
+        return self.batchers[category]
+
+    def parse_payload(self, body):
+        """(categoria, títulos) do corpo de /extract; ValueError se a requisição for inválida."""
+        payload = json.loads(body or b"{}")
+        if not isinstance(payload, dict):
+            raise ValueError("body must be a JSON object")
+        category = payload.get("category", DEFAULT_CATEGORY)
+        if not isinstance(category, str) or category not in self.router.category_models:
+            raise ValueError(f"Unknown category: {category}")
+        if "titles" in payload:
+            titles = payload["titles"]
+        elif "title" in payload:
+            titles = [payload["title"]]
+        else:
+            raise ValueError("missing 'titles' or 'title'")
+        if not isinstance(titles, list):
+            raise ValueError("'titles' must be a list")
+        return category, [title if isinstance(title, str) else "" for title in titles]
+
+    async def extract(self, category, titles):
+        entity_lists = await self.batcher(category).submit(titles)
+        # Mesmos campos das linhas de test_model, com todas as entidades do modelo ao lado
+        results = []
+        for title, entities in zip(titles, entity_lists):
+            row = to_result_row(title, entities)
+            row["Entidades"] = entities
+            results.append(row)
+        return {"category": category, "results": results}
+
+    async def dispatch(self, method, path, body):
+        """(status, corpo, content-type) da resposta."""
+        if method == "GET" and path == "/health":
+            return HTTPStatus.OK, json.dumps({"status": "ok", "models": sorted(self.router.models)}), "application/json"
+        if method == "GET" and path == "/metrics":
+            return HTTPStatus.OK, METRICS.to_prometheus(), "text/plain; version=0.0.4"
+        if path != "/extract":
+            return HTTPStatus.NOT_FOUND, json.dumps({"error": "not found"}), "application/json"
+        if method != "POST":
+            return HTTPStatus.METHOD_NOT_ALLOWED, json.dumps({"error": "use POST"}), "application/json"
+        try:
+            category, titles = self.parse_payload(body)
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, json.dumps({"error": str(e)}, ensure_ascii=False), "application/json"
+        try:
+            response = await self.extract(category, titles)
+        except Exception as e:
+            # Falha do modelo ou erro interno: o cliente recebe 500 em vez de uma conexão fechada
+            METRICS.count("service_errors", error=type(e).__name__)
+            return (HTTPStatus.INTERNAL_SERVER_ERROR, json.dumps({"error": f"{type(e).__name__}: {e}"}, ensure_ascii=False),
+                    "application/json")
+        return HTTPStatus.OK, json.dumps(response, ensure_ascii=False), "application/json"
+
+    async def handle(self, reader, writer):
+        """Conexão HTTP/1.1 com keep-alive: várias requisições em sequência no mesmo socket."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                start = time.perf_counter()
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    status, content, content_type = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "{}", "application/json"
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, content, content_type = await self.dispatch(method, path.split("?", 1)[0], body)
+                    keep_alive = headers.get("connection", "").lower() != "close"
+
+                data = content.encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                route = path.split("?", 1)[0]
+                METRICS.add_time("service_request", time.perf_counter() - start,
+                                 path=route if route in ROUTES else "other")
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+async def serve(host, port, categories, max_batch_size, max_wait_ms, batch_size, category_models=CATEGORY_MODELS):
+    router = ModelRouter(category_models=category_models, batch_size=batch_size)
+    start = time.perf_counter()
+    # Carrega os modelos antes de aceitar conexões
+    for category in categories:
+        router.get_model(category)
+    print(f"Loaded {len(categories)} models in {time.perf_counter() - start:.2f}s")
+
+    service = NERService(router, max_batch_size, max_wait_ms)
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f"Listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+def report_latency(path="/extract"):
+    """p50/p99 por requisição (timer service_request), também exportados em /metrics."""
+    quantiles = METRICS.quantiles("service_request", path=path)
+    if quantiles:
+        print(f"{path}: p50 {quantiles[50] * 1000:.2f}ms, p99 {quantiles[99] * 1000:.2f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço HTTP local de extração de entidades com micro-lotes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--categories", nargs="+", default=list(CATEGORY_MODELS))
+    parser.add_argument("--max-batch-size", type=int, default=64, help="títulos por micro-lote")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="espera máxima para completar um micro-lote")
+    parser.add_argument("--batch-size", type=int, default=256, help="batch_size do nlp.pipe")
+    parser.add_argument("--model", action="append", default=[], metavar="CATEGORIA=DIRETÓRIO",
+                        help="usa outro modelo para a categoria (ex.: um aluno de ner_distill.py)")
+    parser.add_argument("--joint", help="diretório de um modelo conjunto (ner_joint.py) para todas as categorias")
+    args = parser.parse_args()
+
+    category_models = joint_category_models(args.joint) if args.joint else dict(CATEGORY_MODELS)
+    for override in args.model:
+        category, _, model_dir = override.partition("=")
+        if category not in category_models or not model_dir:
+            parser.error(f"invalid --model {override!r}")
+        category_models[category] = os.path.abspath(model_dir)
+    try:
+        asyncio.run(serve(args.host, args.port, args.categories, args.max_batch_size, args.max_wait_ms,
+                          args.batch_size, category_models))
+    except KeyboardInterrupt:
+        report_latency()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import copy
+import hashlib
+import os
+import pickle
+import random
+import time
+from collections import Counter
+import numpy
+from spacy.tokens import Doc
+from spacy.training import Example
+from spacy.util import minibatch, compounding
+from ner_labeling import snap_entities
+from ner_metrics import METRICS, RateLimitedLog
+
+def make_examples(nlp, training_data, category=None):
+    """Converte (texto, anotações) em Examples uma única vez, antes das iterações.
+
+    As entidades são alinhadas aos tokens aqui (ver snap_entities); títulos que ficam
+    sem nenhuma entidade são descartados em vez de gastar treino com rótulos perdidos.
+    """
+    stats = Counter()
+    examples = []
+    with METRICS.timer("examples", rss=True):
+        for text, annotations in training_data:
+            reference = nlp.make_doc(text)
+            spans, rejected, status = snap_entities(reference, annotations["entities"])
+            stats.update(status)
+            if not spans:
+                stats["dropped"] += 1
+                continue
+            reference.set_ents(spans, missing=rejected, default="outside")
+            predicted = Doc(nlp.vocab, words=[t.text for t in reference], spaces=[bool(t.whitespace_) for t in reference])
+            examples.append(Example(predicted, reference))
+    labels = {"category": category} if category else {}
+    for result, n in stats.items():
+        METRICS.count("span_alignment", n, result=result, **labels)
+    METRICS.count("examples", len(examples))
+    print(f"Alignment{' ' + category if category else ''}: {sum(stats[k] for k in ('aligned', 'fixed', 'rejected'))} spans, "
+          f"{stats['aligned']} aligned, {stats['fixed']} fixed, {stats['rejected']} rejected, "
+          f"{stats['dropped']} titles dropped")
+    return examples
+
+def finish_update(nlp, optimizer):
+    """Aplica no otimizador os gradientes acumulados pelos componentes treináveis."""
+    for name, proc in nlp.pipeline:
+        if getattr(proc, "is_trainable", False) and proc.model not in (True, False, None):
+            proc.finish_update(optimizer)
+
+def update_epoch(nlp, examples, optimizer, batch_size=(4.0, 32.0, 1.001), drop=0.5, accumulate_gradient=1):
+    """Uma passada pelos exemplos com um nlp.update por minibatch.
+
+    Com accumulate_gradient > 1, os gradientes de tantos minibatches consecutivos
+    são somados antes de cada passo do otimizador (lote efetivo maior).
+    """
+    losses = {}
+    batches = minibatch(examples, size=compounding(*batch_size))
+    if accumulate_gradient == 1:
+        for batch in batches:
+            with METRICS.timer("update"):
+                nlp.update(batch, drop=drop, sgd=optimizer, losses=losses)
+            METRICS.count("update_examples", len(batch))
+        return losses
+
+    pending = 0
+    for batch in batches:
+        with METRICS.timer("update"):
+            nlp.update(batch, drop=drop, sgd=False, losses=losses)
+        METRICS.count("update_examples", len(batch))
+        pending += 1
+        if pending == accumulate_gradient:
+            finish_update(nlp, optimizer)
+            pending = 0
+    if pending:
+        finish_update(nlp, optimizer)
+    return losses
+
+def split_examples(examples, dev_fraction=0.1, seed=0):
+    """Separa uma parte fixa (e reprodutível) dos Examples para avaliação."""
+    shuffled = list(examples)
+    random.Random(seed).shuffle(shuffled)
+    n_dev = int(len(shuffled) * dev_fraction)
+    return shuffled[n_dev:], shuffled[:n_dev]
+
+def evaluate(nlp, dev_examples):
+    """P/R/F1 das entidades (geral e por rótulo) no conjunto de avaliação."""
+    # Docs previstos novos a cada avaliação, sem passar pelo tokenizer
+    fresh = [
+        Example(Doc(nlp.vocab, words=[t.text for t in eg.reference], spaces=[bool(t.whitespace_) for t in eg.reference]),
+                eg.reference)
+        for eg in dev_examples
+    ]
+    return nlp.evaluate(fresh)
+
+def print_scores(itn, scores):
+    print(f"Iteration {itn}, Dev P/R/F1: {scores['ents_p'] or 0:.3f}/{scores['ents_r'] or 0:.3f}/{scores['ents_f'] or 0:.3f}")
+    for label, label_scores in sorted((scores.get('ents_per_type') or {}).items()):
+        print(f"    {label:<12} P={label_scores['p']:.3f} R={label_scores['r']:.3f} F={label_scores['f']:.3f}")
+
+def snapshot(nlp):
+    """Pesos dos componentes ativos, para restaurar o melhor ponto do treino."""
+    return {name: proc.to_bytes() for name, proc in nlp.pipeline}
+
+def restore(nlp, weights):
+    for name, proc in nlp.pipeline:
+        proc.from_bytes(weights[name])
+
+CHECKPOINT_FILE = "checkpoint.pkl"
+# Tabelas do otimizador (Adam) indexadas por (id do nó do thinc, nome do parâmetro)
+OPTIMIZER_TABLES = ("mom1", "mom2", "averages", "nr_update", "last_seen")
+
+def node_positions(nlp):
+    """id de cada nó do modelo -> (componente, posição em model.walk()).
+
+    Os ids do thinc dependem da ordem em que os modelos foram criados no processo;
+    a posição do nó no componente é a mesma em qualquer processo.
+    """
+    positions = {}
+    for name, proc in nlp.pipeline:
+        model = getattr(proc, "model", None)
+        if model in (True, False, None):
+            continue
+        for position, node in enumerate(model.walk()):
+            positions[node.id] = (name, position)
+    return positions
+
+def rekey_optimizer(optimizer, mapping):
+    """Troca o primeiro elemento das chaves das tabelas do otimizador segundo `mapping`."""
+    for table_name in OPTIMIZER_TABLES:
+        table = getattr(optimizer, table_name)
+        if table is None:
+            continue
+        rekeyed = copy.copy(table)
+        rekeyed.clear()
+        rekeyed.update({(mapping[node], param): value for (node, param), value in table.items() if node in mapping})
+        setattr(optimizer, table_name, rekeyed)
+
+def examples_fingerprint(examples):
+    digest = hashlib.sha256()
+    for example in examples:
+        digest.update(example.reference.text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def save_checkpoint(checkpoint_dir, nlp, optimizer, state):
+    """Grava de forma atômica pesos, otimizador, estado dos geradores aleatórios e do laço de treino."""
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    positions = node_positions(nlp)
+    tables = {name: getattr(optimizer, name) for name in OPTIMIZER_TABLES}
+    rekey_optimizer(optimizer, positions)
+    try:
+        optimizer_bytes = pickle.dumps(optimizer)
+    finally:
+        for name, table in tables.items():
+            setattr(optimizer, name, table)
+    checkpoint = dict(state, weights=snapshot(nlp), optimizer=optimizer_bytes,
+                      random_state=random.getstate(), numpy_state=numpy.random.get_state())
+    path = os.path.join(checkpoint_dir, CHECKPOINT_FILE)
+    with open(path + ".tmp", "wb") as f:
+        pickle.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+def load_checkpoint(checkpoint_dir, nlp):
+    """Restaura pesos e geradores aleatórios; retorna (otimizador, estado do laço) ou None sem checkpoint."""
+    path = os.path.join(checkpoint_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        checkpoint = pickle.load(f)
+    restore(nlp, checkpoint.pop("weights"))
+    optimizer = pickle.loads(checkpoint.pop("optimizer"))
+    rekey_optimizer(optimizer, {position: node for node, position in node_positions(nlp).items()})
+    random.setstate(checkpoint.pop("random_state"))
+    numpy.random.set_state(checkpoint.pop("numpy_state"))
+    return optimizer, checkpoint
+
+def train_epochs(nlp, examples, optimizer, iterations, batch_size=(4.0, 32.0, 1.001), drop=0.5, accumulate_gradient=1,
+                 dev_examples=None, eval_every=5, patience=3, log_interval=5.0,
+                 checkpoint_dir=None, checkpoint_every=10, resume=False):
+    """Treina por até `iterations` passadas embaralhadas, informando perdas e tempo a cada `log_interval` segundos.
+
+    Com dev_examples, avalia a cada `eval_every` iterações, para depois de `patience`
+    avaliações sem melhorar o F1 e volta aos pesos da melhor avaliação.
+    Exemplos com peso (reference.user_data["weight"], ver ner_dedup.py) são sorteados em
+    cada época com probabilidade proporcional ao peso.
+    Com checkpoint_dir, a cada `checkpoint_every` iterações o estado completo do treino é
+    gravado em <checkpoint_dir>/checkpoint.pkl; com resume=True o treino continua desse
+    ponto, com a mesma sequência de embaralhamentos. O checkpoint é apagado no fim do treino.
+    """
+    total_start = time.perf_counter()
+    best_f, best_itn, best_weights = -1.0, None, None
+    evals_without_improvement = 0
+    log = RateLimitedLog(log_interval)
+    sample_weights = [eg.reference.user_data.get("weight", 1) for eg in examples]
+    weighted = any(weight != 1 for weight in sample_weights)
+    original = list(examples)
+    fingerprint = examples_fingerprint(original) if checkpoint_dir else None
+    first_itn = 0
+    loaded = load_checkpoint(checkpoint_dir, nlp) if checkpoint_dir and resume else None
+    if loaded:
+        optimizer, state = loaded
+        if state["fingerprint"] != fingerprint:
+            raise ValueError(f"Checkpoint in {checkpoint_dir} was made with different training examples")
+        # A lista volta à ordem em que estava, pois cada época embaralha a da época anterior
+        examples[:] = [original[i] for i in state["order"]]
+        first_itn = state["iteration"]
+        best_f, best_itn, best_weights = state["best_f"], state["best_itn"], state["best_weights"]
+        evals_without_improvement = state["evals_without_improvement"]
+        print(f"Resuming from iteration {first_itn} ({checkpoint_dir})")
+    positions = {id(example): i for i, example in enumerate(original)}
+    for itn in range(first_itn, iterations):
+        if weighted:
+            epoch_examples = random.choices(examples, weights=sample_weights, k=len(examples))
+        else:
+            random.shuffle(examples)
+            epoch_examples = examples
+        start = time.perf_counter()
+        with METRICS.timer("epoch", rss=True):
+            losses = update_epoch(nlp, epoch_examples, optimizer, batch_size=batch_size, drop=drop,
+                                  accumulate_gradient=accumulate_gradient)
+        evaluating = bool(dev_examples) and (itn + 1) % eval_every == 0
+        log(f"Iteration {itn + 1}, Losses: {losses}, Time: {time.perf_counter() - start:.2f}s",
+            force=evaluating or itn + 1 == iterations)
+        METRICS.export(min_interval=log_interval)
+
+        stop = False
+        if evaluating:
+            scores = evaluate(nlp, dev_examples)
+            print_scores(itn + 1, scores)
+            f_score = scores['ents_f'] or 0.0
+            if f_score > best_f:
+                best_f, best_itn, best_weights = f_score, itn + 1, snapshot(nlp)
+                evals_without_improvement = 0
+            else:
+                evals_without_improvement += 1
+                if evals_without_improvement >= patience:
+                    print(f"Early stopping at iteration {itn + 1}")
+                    stop = True
+
+        if stop:
+            break
+        if checkpoint_dir and (itn + 1) % checkpoint_every == 0 and itn + 1 < iterations:
+            with METRICS.timer("checkpoint"):
+                save_checkpoint(checkpoint_dir, nlp, optimizer, {
+                    "iteration": itn + 1, "fingerprint": fingerprint,
+                    "order": [positions[id(example)] for example in examples],
+                    "best_f": best_f, "best_itn": best_itn, "best_weights": best_weights,
+                    "evals_without_improvement": evals_without_improvement,
+                })
+
+    if checkpoint_dir and os.path.exists(os.path.join(checkpoint_dir, CHECKPOINT_FILE)):
+        os.remove(os.path.join(checkpoint_dir, CHECKPOINT_FILE))
+    if best_weights is not None:
+        restore(nlp, best_weights)
+        print(f"Best dev F1 {best_f:.3f} at iteration {best_itn}")
+    print(f"Training finished in {time.perf_counter() - total_start:.2f}s")
+
+def add_labels(ner, examples):
+    """Adiciona ao NER todos os rótulos presentes nos Examples."""
+    for example in examples:
+        for ent in example.reference.ents:
+            ner.add_label(ent.label_)
@@ -1,69 +1,47 @@
-import pandas as pd
 import spacy
-from spacy.util import minibatch, compounding
-from spacy.training import Example
-import random
-import re
+from ner_corpus import cached_examples
+from ner_io import read_table
+from ner_labeling import literal_spans, resolve_entities, to_training_data
+from ner_training import add_labels, split_examples, train_epochs
 
 def load_data(file_path):
-    df = pd.read_csv(file_path)
+    df = read_table(file_path)
     return df
 
-def prepare_training_data(df):
-    training_data = []
-    for _, row in df.iterrows():
-        text = row['title']
-        entities = []
-
-        def find_entity(entity_type, pattern, existing_entities):
-            match = re.finditer(pattern, text, re.IGNORECASE)
-            for m in match:
-                start, end = m.start(), m.end()
-                if not any(e_start < end and start < e_end for e_start, e_end, _ in existing_entities):
-                    return (start, end, entity_type)
-            return None
+def extract_entities(texts, df):
+    entities = [[] for _ in texts]
 
-        entity_types = {
-            'MODEL': row['model'],
-            'CPU': row['cpu'],
-            'GPU': row['gpu'],
-            'RAM': row['ram'],
-            'SSD': row['ssd']
-        }
+    entity_columns = {
+        'MODEL': 'model',
+        'CPU': 'cpu',
+        'GPU': 'gpu',
+        'RAM': 'ram',
+        'SSD': 'ssd'
+    }
 
-        for entity_type, value in entity_types.items():
-            if pd.notna(value):
-                entity = find_entity(entity_type, re.escape(str(value)), entities)
-                if entity:
-                    entities.append(entity)
+    # Valores nulos não geram candidatos
+    for entity_type, column in entity_columns.items():
+        resolve_entities(entities, literal_spans(texts, df[column]), entity_type)
 
-        if entities:
-            training_data.append((text, {"entities": entities}))
+    return entities
 
-    return training_data
+def prepare_training_data(df):
+    texts = df['title'].tolist()
+    return to_training_data(texts, extract_entities(texts, df))
 
-def train_model(training_data, model_path, iterations=150):
-    nlp = spacy.load(model_path)  # Carrega o modelo pré-treinado
+def train_model(nlp, examples, iterations=150, accumulate_gradient=1, dev_examples=None,
+                checkpoint_dir=None, checkpoint_every=10, resume=False):
     ner = nlp.get_pipe("ner")
 
-    for _, annotations in training_data:
-        for ent in annotations.get("entities"):
-            ner.add_label(ent[2])  # Adiciona novas etiquetas de entidades
+    add_labels(ner, examples)  # Adiciona novas etiquetas de entidades
 
     other_pipes = [pipe for pipe in nlp.pipe_names if pipe != "ner"]
     with nlp.disable_pipes(*other_pipes):
         optimizer = nlp.resume_training()  # Retoma o treinamento
-        for itn in range(iterations):
-            random.shuffle(training_data)
-            losses = {}
-            batches = minibatch(training_data, size=compounding(4.0, 32.0, 1.001))
-
-            for batch in batches:
-                for text, annotations in batch:
-                    doc = nlp.make_doc(text)
-                    example = Example.from_dict(doc, annotations)
-                    nlp.update([example], drop=0.5, sgd=optimizer, losses=losses)
-            print(f"Iteration {itn + 1}, Losses: {losses}")
+        # Cada minibatch vira um único nlp.update
+        train_epochs(nlp, examples, optimizer, iterations, batch_size=(4.0, 32.0, 1.001), drop=0.5,
+                     accumulate_gradient=accumulate_gradient, dev_examples=dev_examples,
+                     checkpoint_dir=checkpoint_dir, checkpoint_every=checkpoint_every, resume=resume)
 
     return nlp
 
@@ -75,10 +53,15 @@ def main():
     output_dir = "modelo_ner_notebooks6_last"
     model_path = "/media/paulo-jaka/Extras/Machine-learning/modelo_ner_notebooks5_last"  
 
-    df = load_data(csv_file)
-    training_data = prepare_training_data(df)
-
-    nlp = train_model(training_data, model_path)
+    nlp = spacy.load(model_path)  # Carrega o modelo pré-treinado
+    # Rotulagem e tokenização vêm do cache .spacy quando o CSV e o rotulador não mudaram
+    examples = cached_examples(nlp, csv_file, "notebooks", prepare_training_data, (extract_entities,), load_data=load_data)
+
+    # Separa 10% dos exemplos para avaliação e parada antecipada
+    train_examples, dev_examples = split_examples(examples)
+    # Checkpoints a cada 10 iterações; se a execução anterior caiu no meio, continua de onde parou
+    nlp = train_model(nlp, train_examples, dev_examples=dev_examples,
+                      checkpoint_dir="checkpoints/notebooks_retrain", resume=True)
     save_model(nlp, output_dir)
 
 if __name__ == "__main__":
@@ -1,64 +1,20 @@
 import pandas as pd
-import spacy
-import re
+from ner_cache import TitleCache, model_fingerprint
+from ner_inference import load_model, extract_title_entities, stream_csv, to_result_row
+from ner_metrics import METRICS
+from ner_rules import RuleStage, load_known_models
 
-def load_model(model_dir):
-    """Carrega o modelo NER existente."""
-    return spacy.load(model_dir)
-
-def extract_entities(nlp, text):
-    """Extrai entidades do texto usando o modelo NER."""
-    doc = nlp(text)
-    entities = {ent.label_: ent.text for ent in doc.ents}
-    return entities
-
-def extract_ram(title):
-    """Extrai RAM usando regex, procurando pela palavra 'RAM' (case insensitive)."""
-    match = re.search(r"(\d+)\s*GB\s*RAM", title, re.IGNORECASE)
-    if match:
-        return match.group(1) + " GB"
-    return None
-
-def extract_storage_capacity(title):
-    """Extrai armazenamento usando regex, procurando valores seguidos de 'GB' e maiores que 16."""
-    match = re.search(r"(\d+)\s*GB", title, re.IGNORECASE)
-    if match and int(match.group(1)) > 16:
-        return match.group(1) + " GB" 
-    return None
-
-def test_model(nlp, df):
+def test_model(nlp, df, cache=None, batch_size=1000, n_process=1, rules=None):
     """Testa o modelo NER em um DataFrame e tenta extrair entidades de títulos."""
     results = []
-    
-    for index, row in df.iterrows():
-        title = row['title']  # Supondo que a coluna do título se chama 'Título'
-        attempts = 0
-        entities_found = {}
-        
-        # Tenta extrair as entidades até 5 vezes
-        while attempts < 5 and (len(entities_found) < 3):  # 3 entidades: Modelo, RAM, Armazenamento
-            entities_found = extract_entities(nlp, title)
-            attempts += 1
+    titles = df['title']  # Supondo que a coluna do título se chama 'title'
+    entities_stream = extract_title_entities(nlp, titles, cache=cache, batch_size=batch_size, n_process=n_process,
+                                             rules=rules)
 
-        # Se RAM não foi encontrado, tenta com regex
-        if 'RAM' not in entities_found:
-            ram_regex = extract_ram(title)
-            if ram_regex:
-                entities_found['RAM'] = ram_regex
-        
-        # Se Armazenamento não foi encontrado, tenta com regex
-        if 'STORAGE' not in entities_found:
-            storage_regex = extract_storage_capacity(title)
-            if storage_regex:
-                entities_found['STORAGE'] = storage_regex
-        
+    # O fallback de regex para RAM e Armazenamento é aplicado dentro de extract_title_entities
+    for title, entities_found in zip(titles, entities_stream):
         # Adiciona os resultados ao DataFrame
-        results.append({
-            'Título': title,
-            'Modelo': entities_found.get('MODEL', None),
-            'RAM': entities_found.get('RAM', None),
-            'Armazenamento': entities_found.get('STORAGE', None),
-        })
+        results.append(to_result_row(title, entities_found))
 
     return pd.DataFrame(results)
 
@@ -66,18 +22,25 @@ def main():
     """Função principal para testar o modelo e salvar os resultados em um CSV."""
     csv_file = "/home/paulo-jaka/Downloads/datasets_trabalho/tablets_new_training_data.csv"  # Atualize o caminho para o seu CSV
     model_dir = "/media/paulo-jaka/Extras/Machine-learning/modelo_ner_celulares_retrained"  # Diretório do seu modelo
-    
-    # Carrega o DataFrame do CSV
-    df = pd.read_csv(csv_file)
+    output_file = "r2esultado_extração_entidades.csv"
+    cache_db = "cache_entidades.sqlite"  # Cache persistente título -> entidades
+    known_models_csv = "/media/paulo-jaka/Extras/Machine-learning/base-de-dados/uai2.csv"  # Coluna 'modelo' com os modelos conhecidos
     
     # Carrega o modelo NER
     nlp = load_model(model_dir)
     
-    # Testa o modelo nos dados
-    results_df = test_model(nlp, df)
-    
-    # Salva os resultados em um novo CSV
-    results_df.to_csv("r2esultado_extração_entidades.csv", index=False)
+    # Processa o CSV em pedaços, anexando os resultados ao CSV de saída conforme ficam prontos;
+    # se a execução anterior foi interrompida, continua de onde parou
+    # Títulos em que as regras resolvem modelo, RAM e armazenamento não passam pelo modelo
+    rules = RuleStage(load_known_models(known_models_csv))
+    fingerprint = model_fingerprint(model_dir)
+    with TitleCache(cache_db, fingerprint) as cache:
+        rows = stream_csv(nlp, csv_file, output_file, title_column='title', cache=cache, rules=rules,
+                          model_id=fingerprint)
+        print(f"{rows} títulos processados. Cache: {cache.stats()}")
+    paths = METRICS.counters_by("cascade_titles", "path")
+    print(f"Cascata: {paths}; regras {METRICS.seconds('rule_stage'):.2f}s, "
+          f"modelo {METRICS.seconds('inference'):.2f}s")
 
 if __name__ == "__main__":
     main()
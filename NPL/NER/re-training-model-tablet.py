@@ -1,87 +1,49 @@
-import pandas as pd
 import spacy
-from spacy.util import minibatch, compounding
-from spacy.training import Example
-import random
-import re
+from ner_corpus import cached_examples
+from ner_io import read_table
+from ner_labeling import literal_spans, resolve_entities, to_training_data
+from ner_training import add_labels, split_examples, train_epochs
 
 def load_data(file_path):
     """Carrega os dados do CSV."""
-    return pd.read_csv(file_path)
+    return read_table(file_path)
 
 def load_model(model_dir):
     """Carrega o modelo NER existente."""
     return spacy.load(model_dir)
 
-def find_entity(entity_type, pattern, text, existing_entities):
-    """Encontra a entidade no texto com base no padrão fornecido."""
-    matches = list(re.finditer(pattern, text, re.IGNORECASE))
-    for m in matches:
-        start, end = m.start(), m.end()
-        # Verifica se a entidade não está sobrepondo com outras
-        if not any(e_start < end and start < e_end for e_start, e_end, _ in existing_entities):
-            return (start, end, entity_type)
-    return None
-
-def extract_entities_from_csv(text, row):
+def extract_entities_from_csv(texts, df):
     """Extrai entidades APENAS com base nas informações do CSV."""
-    entities = []
-    
-    # Verifica se existe valor no CSV para cada entidade
-    if pd.notnull(row['Modelo']):
-        model_entity = find_entity('MODEL', re.escape(row['Modelo']), text, entities)
-        if model_entity:
-            entities.append(model_entity)
+    entities = [[] for _ in texts]
     
-    if pd.notnull(row['RAM']):
-        ram_entity = find_entity('RAM', re.escape(row['RAM']), text, entities)
-        if ram_entity:
-            entities.append(ram_entity)
-    
-    if pd.notnull(row['Armazenamento']):
-        storage_entity = find_entity('STORAGE', re.escape(row['Armazenamento']), text, entities)
-        if storage_entity:
-            entities.append(storage_entity)
+    # Valores nulos no CSV não geram candidatos
+    resolve_entities(entities, literal_spans(texts, df['Modelo']), 'MODEL')
+    resolve_entities(entities, literal_spans(texts, df['RAM']), 'RAM')
+    resolve_entities(entities, literal_spans(texts, df['Armazenamento']), 'STORAGE')
     
     return entities
 
 def prepare_training_data(df):
     """Prepara os dados de treinamento APENAS com base nos valores explícitos do CSV."""
-    training_data = []
-    for _, row in df.iterrows():
-        text = row['Título']
-        
-        # Extrai entidades com base no CSV
-        entities = extract_entities_from_csv(text, row)
+    texts = df['Título'].tolist()
+    return to_training_data(texts, extract_entities_from_csv(texts, df))
 
-        if entities:
-            training_data.append((text, {"entities": entities}))
-    
-    return training_data
-
-def train_model(nlp, training_data, iterations=200):
+def train_model(nlp, examples, iterations=200, accumulate_gradient=1, dev_examples=None,
+                checkpoint_dir=None, checkpoint_every=10, resume=False):
     """Treina o modelo NER com os dados de treinamento fornecidos."""
     ner = nlp.get_pipe("ner")
     
     # Adiciona os rótulos das entidades ao NER
-    for _, annotations in training_data:
-        for ent in annotations.get("entities"):
-            ner.add_label(ent[2])
+    add_labels(ner, examples)
 
     # Treina o modelo
     other_pipes = [pipe for pipe in nlp.pipe_names if pipe != "ner"]
     with nlp.disable_pipes(*other_pipes):
         optimizer = nlp.resume_training()
-        for itn in range(iterations):
-            random.shuffle(training_data)
-            losses = {}
-            batches = minibatch(training_data, size=compounding(8.0, 32.0, 1.01))
-            for batch in batches:
-                for text, annotations in batch:
-                    doc = nlp.make_doc(text)
-                    example = Example.from_dict(doc, annotations)
-                    nlp.update([example], drop=0.3, sgd=optimizer, losses=losses)
-            print(f"Iteration {itn + 1}, Losses: {losses}")
+        # Cada minibatch vira um único nlp.update
+        train_epochs(nlp, examples, optimizer, iterations, batch_size=(8.0, 32.0, 1.01), drop=0.3,
+                     accumulate_gradient=accumulate_gradient, dev_examples=dev_examples,
+                     checkpoint_dir=checkpoint_dir, checkpoint_every=checkpoint_every, resume=resume)
 
 def save_model(nlp, output_dir):
     """Salva o modelo treinado no diretório especificado."""
@@ -93,17 +55,17 @@ def main():
     model_dir = "/media/paulo-jaka/Extras/Machine-learning/NPL/NER/trained_models/modelo_ner_tablets"  # Diretório do modelo existente
     output_dir = "modelo_ner_celulares_retrained"  # Diretório para salvar o modelo re-treinado
     
-    # Carrega os dados do CSV
-    df = load_data(csv_file)
-    
     # Carrega o modelo existente
     nlp = load_model(model_dir)
     
-    # Prepara os dados de treinamento
-    training_data = prepare_training_data(df)
+    # Prepara os dados de treinamento (do cache .spacy quando o CSV e o rotulador não mudaram)
+    examples = cached_examples(nlp, csv_file, "tablets", prepare_training_data, (extract_entities_from_csv,), load_data=load_data)
+    
+    # Separa 10% dos exemplos para avaliação e parada antecipada
+    train_examples, dev_examples = split_examples(examples)
     
     # Treina o modelo com os dados de treinamento
-    train_model(nlp, training_data)
+    train_model(nlp, train_examples, dev_examples=dev_examples)
     
     # Salva o modelo re-treinado
     save_model(nlp, output_dir)
@@ -1,99 +1,54 @@
-import pandas as pd
+import os
 import spacy
-from spacy.util import minibatch, compounding
-from spacy.training import Example
-import random
-import re
+from ner_corpus import cached_examples
+from ner_io import iter_table, read_table
+from ner_labeling import literal_spans, pick_values, resolve_entities, to_training_data
+from ner_patterns import RAM, RAM_LOOSE, STORAGE, leading_number
+from ner_training import add_labels, split_examples, train_epochs
 
 def load_data(file_path):
-    return pd.read_csv(file_path)
+    return read_table(file_path)
 
-def find_entity(entity_type, pattern, text, existing_entities):
-    matches = list(re.finditer(pattern, text, re.IGNORECASE))
-    for m in matches:
-        start, end = m.start(), m.end()
-        
-        if not any(e_start < end and start < e_end for e_start, e_end, _ in existing_entities):
-            return (start, end, entity_type)
-    return None
-
-def extract_entities(text, row):
-    entities = []
+def extract_entities(texts, df):
+    entities = [[] for _ in texts]
     
-    entity_patterns = {
-        'MODEL': re.escape(row['modelo']),
-        'RAM': r'\b(\d+\s*GB RAM|\d+\s*G RAM|\d+\s*GB|\d+\s*RAM)\b',
-        'STORAGE': r'\b(\d+\s*GB|\d+\s*TB)\b',
-    }
-
-    model_entity = find_entity('MODEL', entity_patterns['MODEL'], text, entities)
-    if model_entity:
-        entities.append(model_entity)
+    # Extract model
+    resolve_entities(entities, literal_spans(texts, df['modelo']), 'MODEL')
     
-    storage_values = re.findall(entity_patterns['STORAGE'], text, re.IGNORECASE)
-    ram_values = re.findall(entity_patterns['RAM'], text, re.IGNORECASE)
+    # Extract storage (maior valor do título)
+    storage_values = pick_values(texts, STORAGE, largest=True)
+    resolve_entities(entities, literal_spans(texts, storage_values), 'STORAGE')
     
-    if storage_values:
-        storage_values.sort(key=lambda x: int(re.search(r'\d+', x).group()), reverse=True)
-        storage_value = storage_values[0]
-        
-        storage_entity = find_entity('STORAGE', re.escape(storage_value), text, entities)
-        if storage_entity:
-            entities.append(storage_entity)
-
-        if ram_values:
-            ram_values.sort(key=lambda x: int(re.search(r'\d+', x).group()))
-            ram_value = ram_values[0]
-
-            ram_entity = find_entity('RAM', re.escape(ram_value), text, entities)
-            if ram_entity:
-                entities.append(ram_entity)
-        else:
-            potential_rams = re.findall(r'\b\d+\s*(?:RAM|G)\b', text, re.IGNORECASE)
-            potential_rams = [x for x in potential_rams if int(re.search(r'\d+', x).group()) < 12]
-            potential_rams.sort(key=lambda x: int(re.search(r'\d+', x).group()))
-            
-            if potential_rams:
-                ram_value = potential_rams[0]
-                ram_entity = find_entity('RAM', re.escape(ram_value), text, entities)
-                if ram_entity:
-                    entities.append(ram_entity)
+    # Extract RAM (menor valor do título)
+    # RAM só é procurada em títulos com armazenamento
+    has_storage = [value is not None for value in storage_values]
+    ram_values = pick_values(texts, RAM, mask=has_storage)
     
+    # Sem RAM no formato comum: procura "4G", "8 RAM"... com valor menor que 12
+    missing_ram = [value is None and use for value, use in zip(ram_values, has_storage)]
+    potential_rams = pick_values(texts, RAM_LOOSE, accept=lambda value: leading_number(value) < 12, mask=missing_ram)
+    ram_values = [value if value is not None else potential for value, potential in zip(ram_values, potential_rams)]
+    resolve_entities(entities, literal_spans(texts, ram_values), 'RAM')
     
     return entities
 
 def prepare_training_data(df):
-    training_data = []
-    for _, row in df.iterrows():
-        text = row['title']
-        entities = extract_entities(text, row)
+    texts = df['title'].tolist()
+    return to_training_data(texts, extract_entities(texts, df))
 
-        if entities:
-            training_data.append((text, {"entities": entities}))
-    
-    return training_data
-
-def train_model(training_data, iterations=200):
-    nlp = spacy.blank("pt")
+def train_model(nlp, examples, iterations=200, accumulate_gradient=1, dev_examples=None,
+                checkpoint_dir=None, checkpoint_every=10, resume=False):
     ner = nlp.add_pipe("ner", last=True)
     
-    for _, annotations in training_data:
-        for ent in annotations.get("entities"):
-            ner.add_label(ent[2])
+    add_labels(ner, examples)
 
     other_pipes = [pipe for pipe in nlp.pipe_names if pipe != "ner"]
     with nlp.disable_pipes(*other_pipes):
         optimizer = nlp.begin_training()
-        for itn in range(iterations):
-            random.shuffle(training_data)
-            losses = {}
-            batches = minibatch(training_data, size=compounding(4.0, 32.0, 1.001))
-            for batch in batches:
-                for text, annotations in batch:
-                    doc = nlp.make_doc(text)
-                    example = Example.from_dict(doc, annotations)
-                    nlp.update([example], drop=0.5, sgd=optimizer, losses=losses)
-            print(f"Iteration {itn + 1}, Losses: {losses}")
+        # Cada minibatch vira um único nlp.update
+        train_epochs(nlp, examples, optimizer, iterations, batch_size=(4.0, 32.0, 1.001), drop=0.5,
+                     accumulate_gradient=accumulate_gradient, dev_examples=dev_examples,
+                     checkpoint_dir=checkpoint_dir, checkpoint_every=checkpoint_every, resume=resume)
     
     return nlp
 
@@ -104,10 +59,15 @@ def main():
     csv_file = "/media/paulo-jaka/Extras/Machine-learning/base-de-dados/uai2.csv"
     output_dir = "modelo_ner_celulares2"
     
-    df = load_data(csv_file)
-    training_data = prepare_training_data(df)
+    nlp = spacy.blank("pt")
+    # Rotulagem e tokenização vêm do cache .spacy quando o CSV e o rotulador não mudaram;
+    # CSV grande: rotulagem em pedaços usando todos os núcleos
+    examples = cached_examples(nlp, csv_file, "celulares", prepare_training_data, (extract_entities,),
+                               load_data=load_data, load_chunks=iter_table, workers=os.cpu_count())
     
-    nlp = train_model(training_data)
+    # Separa 10% dos exemplos para avaliação e parada antecipada
+    train_examples, dev_examples = split_examples(examples)
+    nlp = train_model(nlp, train_examples, dev_examples=dev_examples)
     save_model(nlp, output_dir)
 
 if __name__ == "__main__":
@@ -0,0 +1,39 @@
+import spacy
+from spacy.training import Example
+from ner_dedup import collapse_duplicates, entity_values
+
+# Regressão: anúncios que só diferem no valor de uma entidade (RAM/armazenamento)
+# não podem ser colapsados num representante com outro valor.
+
+def make_example(nlp, text, entities):
+    doc = nlp.make_doc(text)
+    return Example.from_dict(doc, {"entities": entities})
+
+def variant(nlp, storage, ram, color):
+    text = f"Smartphone Samsung Galaxy A54 5G {storage} {ram} RAM Tela 6.4 Cor {color}"
+    entities = []
+    for value, label in (("Galaxy A54", "MODEL"), (storage, "STORAGE"), (ram, "RAM")):
+        start = text.index(f" {value} ") + 1
+        entities.append((start, start + len(value), label))
+    return make_example(nlp, text, entities)
+
+def test_value_only_variants_are_not_merged():
+    nlp = spacy.blank("pt")
+    examples = [variant(nlp, storage, ram, color)
+                for storage in ("128GB", "256GB") for ram in ("6GB", "8GB")
+                for color in ("Preto", "Prata", "Verde", "Lilás")]
+    kept = collapse_duplicates(examples)
+
+    assert {entity_values(eg) for eg in kept} == {entity_values(eg) for eg in examples}
+    assert sum(eg.reference.user_data["weight"] for eg in kept) == len(examples)
+    weights = {}
+    for eg in kept:
+        weights[entity_values(eg)] = weights.get(entity_values(eg), 0) + eg.reference.user_data["weight"]
+    assert set(weights.values()) == {4}
+
+def test_exact_duplicates_are_weighted():
+    nlp = spacy.blank("pt")
+    examples = [variant(nlp, "128GB", "8GB", "Preto") for _ in range(3)] + [variant(nlp, "256GB", "8GB", "Preto")]
+    kept = collapse_duplicates(examples, threshold=None)
+
+    assert sorted(eg.reference.user_data["weight"] for eg in kept) == [1, 3]
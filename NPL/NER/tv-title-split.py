@@ -1,65 +1,40 @@
-import pandas as pd
 import spacy
-from spacy.util import minibatch, compounding
-from spacy.training import Example
-import random
-import re
+from ner_corpus import cached_examples
+from ner_io import read_table
+from ner_labeling import literal_spans, resolve_entities, row_pattern_spans, to_training_data
+from ner_patterns import SIZE, size_pattern
+from ner_training import add_labels, split_examples, train_epochs
 
 def load_data(file_path):
-    return pd.read_csv(file_path)
+    return read_table(file_path)
 
-def find_entity(entity_type, pattern, text, existing_entities):
-    matches = list(re.finditer(pattern, text, re.IGNORECASE))
-    for m in matches:
-        start, end = m.start(), m.end()
-        
-        if not any(e_start < end and start < e_end for e_start, e_end, _ in existing_entities):
-            return (start, end, entity_type)
-    return None
+def detect_size_fallback(texts, mask):
+    """Tamanho por fallback (qualquer número de dois dígitos) nas linhas em que o CSV não casou."""
+    fallbacks = []
+    for text, use in zip(texts, mask):
+        match = SIZE.search(text) if use else None
+        fallbacks.append((match.start(), match.end(), 'SIZE') if match else None)
+    return fallbacks
 
-def detect_size_fallback(text):
-    match = re.search(r'\b\d{2}\b', text)
-    if match:
-        return (match.start(), match.end(), 'SIZE')
-    return None
-
-def extract_entities(text, row):
-    entities = []
-    
-    entity_patterns = {
-        'MODEL': re.escape(row['modelo']),
-        'SIZE': rf'\b{row["polegadas"]}\b[\s"]?(?:polegadas|")?',
-        'RESOLUTION': re.escape(row['resolucao']),
-        'TECHNOLOGY': re.escape(row['tecnologia'])
-    }
-
-    print(f"Processing text: {text}")
+def extract_entities(texts, df):
+    entities = [[] for _ in texts]
     
     # Extract model
-    model_entity = find_entity('MODEL', entity_patterns['MODEL'], text, entities)
-    if model_entity:
-        entities.append(model_entity)
+    resolve_entities(entities, literal_spans(texts, df['modelo']), 'MODEL')
     
     # Extract size
-    size_entity = find_entity('SIZE', entity_patterns['SIZE'], text, entities)
-    if size_entity:
-        entities.append(size_entity)
-        print(f"Size entity found: {size_entity}")
-    else:
-        size_fallback_entity = detect_size_fallback(text)
+    size_patterns = [size_pattern(inches) for inches in df['polegadas']]
+    size_found = resolve_entities(entities, row_pattern_spans(texts, size_patterns), 'SIZE')
+    fallbacks = detect_size_fallback(texts, [not found for found in size_found])
+    for row_entities, size_fallback_entity in zip(entities, fallbacks):
         if size_fallback_entity:
-            entities.append(size_fallback_entity)
-            print(f"Size entity found using fallback: {size_fallback_entity}")
+            row_entities.append(size_fallback_entity)
     
     # Extract resolution
-    resolution_entity = find_entity('RESOLUTION', entity_patterns['RESOLUTION'], text, entities)
-    if resolution_entity:
-        entities.append(resolution_entity)
+    resolve_entities(entities, literal_spans(texts, df['resolucao']), 'RESOLUTION')
     
     # Extract technology
-    technology_entity = find_entity('TECHNOLOGY', entity_patterns['TECHNOLOGY'], text, entities)
-    if technology_entity:
-        entities.append(technology_entity)
+    resolve_entities(entities, literal_spans(texts, df['tecnologia']), 'TECHNOLOGY')
     
     return entities
 
@@ -70,38 +45,23 @@ def prepare_training_data(df):
     df['tecnologia'] = df['tecnologia'].astype(str).fillna('')
     df['resolucao'] = df['resolucao'].astype(str).fillna('')
     
-    training_data = []
-    for _, row in df.iterrows():
-        text = row['titulo']
-        entities = extract_entities(text, row)
+    texts = df['titulo'].tolist()
+    return to_training_data(texts, extract_entities(texts, df))
 
-        if entities:
-            training_data.append((text, {"entities": entities}))
-    
-    return training_data
-
-def train_model(training_data, iterations=100):
-    nlp = spacy.blank("pt")
+def train_model(nlp, examples, iterations=100, accumulate_gradient=1, dev_examples=None,
+                checkpoint_dir=None, checkpoint_every=10, resume=False):
     ner = nlp.add_pipe("ner", last=True)
     
     # Add all entity labels
-    for _, annotations in training_data:
-        for ent in annotations.get("entities"):
-            ner.add_label(ent[2])
+    add_labels(ner, examples)
 
     other_pipes = [pipe for pipe in nlp.pipe_names if pipe != "ner"]
     with nlp.disable_pipes(*other_pipes):
         optimizer = nlp.begin_training()
-        for itn in range(iterations):
-            random.shuffle(training_data)
-            losses = {}
-            batches = minibatch(training_data, size=compounding(4.0, 32.0, 1.001))
-            for batch in batches:
-                for text, annotations in batch:
-                    doc = nlp.make_doc(text)
-                    example = Example.from_dict(doc, annotations)
-                    nlp.update([example], drop=0.5, sgd=optimizer, losses=losses)
-            print(f"Iteration {itn + 1}, Losses: {losses}")
+        # Cada minibatch vira um único nlp.update
+        train_epochs(nlp, examples, optimizer, iterations, batch_size=(4.0, 32.0, 1.001), drop=0.5,
+                     accumulate_gradient=accumulate_gradient, dev_examples=dev_examples,
+                     checkpoint_dir=checkpoint_dir, checkpoint_every=checkpoint_every, resume=resume)
     
     return nlp
 
@@ -112,14 +72,18 @@ def main():
     csv_file = "/media/paulo-jaka/Extras/Machine-learning/base-de-dados/training_data_tv2ajustado.csv"
     output_dir = "modelo_ner_tvs"
     
-    df = load_data(csv_file)
-    training_data = prepare_training_data(df)
+    nlp = spacy.blank("pt")
+    # Rotulagem e tokenização vêm do cache .spacy quando o CSV e o rotulador não mudaram
+    examples = cached_examples(nlp, csv_file, "tvs", prepare_training_data, (extract_entities, detect_size_fallback), load_data=load_data)
     
     # Print out some of the training data for debugging
-    for text, annotations in training_data[:5]:  # Print first 5 for quick check
-        print(f"Training data sample: {text} - {annotations}")
+    for example in examples[:5]:  # Print first 5 for quick check
+        entities = [(ent.start_char, ent.end_char, ent.label_) for ent in example.reference.ents]
+        print(f"Training data sample: {example.text} - {entities}")
 
-    nlp = train_model(training_data)
+    # Separa 10% dos exemplos para avaliação e parada antecipada
+    train_examples, dev_examples = split_examples(examples)
+    nlp = train_model(nlp, train_examples, dev_examples=dev_examples)
     save_model(nlp, output_dir)
 
 if __name__ == "__main__":